@@ -3,37 +3,28 @@ import displayio
 import shapes
 import terminalio
 import color
-from sd_manager import SDManager
+from sd_manager import SDManager, SDAsincrono, ERRORES
 
-sd_manager = SDManager()
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+# perezoso: la SD se monta en el primer uso, así la pantalla no la espera.
+# ERRORES: la pantalla se redibuja cada pocos segundos y cada print por USB frena
+sd_manager = SDManager(perezoso=True, informe=ERRORES)
+sd_probada = False  # ya se intentó montar: sin SD la pantalla dice "no montada"
 
 # ---------------------- new file with an incremental name ----------------------
 def siguiente_nombre_incremental(base="archivo", ext="txt", carpeta="/"):
-    if not sd_manager.mounted:
+    if not sd_manager.disponible():
         return f"{base} 1.{ext}"
-    try:
-        existentes = sd_manager.listar(carpeta)
-    except Exception:
-        existentes = []
-    prefijo = f"{base} "
-    sufijo = f".{ext}"
-    max_n = 0
-    for nombre in existentes:
-        if not nombre.endswith(sufijo):
-            continue
-        if not nombre.startswith(prefijo):
-            continue
-        medio = nombre[len(prefijo):-len(sufijo)].strip()
-        try:
-            n = int(medio)
-            if n > max_n:
-                max_n = n
-        except ValueError:
-            pass
-    return f"{base} {max_n + 1}.{ext}"
+    return sd_manager.siguiente_nombre(base, ext, carpeta)
 
 def crear_archivo_incremental():
-    if sd_manager.mounted:
+    global sd_probada
+    sd_probada = True
+    if sd_manager.disponible():
         try:
             nombre = siguiente_nombre_incremental(base="archivo", ext="txt", carpeta="/")
             contenido = "Hola, este es un archivo creado desde CircuitPython.\n"
@@ -92,64 +83,178 @@ def make_line(display, y_px, fg=color.white, bg=color.black, text="", x_px=0, ma
     return g, term
 
 # ---------------------- main screen ----------------------
-def mostrar_sd_info():
-    if not hasattr(board, "DISPLAY"):
-        print("Objeto DISPLAY no encontrado.")
-        return
+class PantallaSD:
+    """
+    Pantalla de info de la SD que se arma una sola vez y después se actualiza.
+    Guarda la TileGrid de cada línea y el texto que muestra; actualizar()
+    reescribe solo las celdas que cambiaron, y con auto_refresh apagado hace
+    un único display.refresh(), que displayio limita a la zona modificada.
+    """
 
-    display = board.DISPLAY
-    splash = displayio.Group()
+    def __init__(self, display, auto_refresh=False):
+        self.display = display
+        self.splash = displayio.Group()
+        self.lineas = []  # [grid, texto_actual, color_actual]
+        self._cambios = False
+        if not auto_refresh:
+            display.auto_refresh = False
 
-    # background color
-    top = shapes.rect(0, 0, display.width, 15, fill=color.violet)
-    splash.append(top)
+        # background color
+        self.top = shapes.rect(0, 0, display.width, 15, fill=color.violet, solid=True)
+        self.splash.append(self.top)
 
-    # Header
-    header = shapes.rect(0, 0, display.width, 30, fill=color.red)
-    splash.append(header)
+        # Header
+        self.header = shapes.rect(0, 0, display.width, 30, fill=color.red, solid=True)
+        self.splash.append(self.header)
 
-    # Title (centrado a ojo en píxeles, pero ajustando por cols visibles con la escala)
-    title = "SD Card Info"
-    # cols en pantalla teniendo en cuenta la escala
-    total_cols_scaled = display.width // (CELL_W * max(1, SCALE))
-    x_title_cols = max(0, (total_cols_scaled - len(title)) // 2)
-    x_title = x_title_cols * CELL_W * max(1, SCALE)
-    title_group, _ = make_line(display, y_px=8, fg=color.white, bg=color.red, text=title, x_px=x_title, scale=SCALE)
-    splash.append(title_group)
+        # Title (centrado a ojo en píxeles, pero ajustando por cols visibles con la escala)
+        title = "SD Card Info"
+        # cols en pantalla teniendo en cuenta la escala
+        total_cols_scaled = display.width // (CELL_W * max(1, SCALE))
+        x_title_cols = max(0, (total_cols_scaled - len(title)) // 2)
+        x_title = x_title_cols * CELL_W * max(1, SCALE)
+        title_group, _ = make_line(display, y_px=8, fg=color.white, bg=color.red, text=title, x_px=x_title, scale=SCALE)
+        self.splash.append(title_group)
 
-    # spacer
-    separator = shapes.rect(0, 30, display.width, 2, fill=color.white)
-    splash.append(separator)
+        # spacer (2 px de alto: como bitmap de 1 bit ocupa menos que 120 tiles sólidos)
+        self.separator = shapes.rect(0, 30, display.width, 2, fill=color.white)
+        self.splash.append(self.separator)
 
-    # Cálculo de salto vertical por línea según escala
-    line_step = CELL_H * max(1, SCALE) + LINE_SP
+        # Cálculo de salto vertical por línea según escala
+        line_step = CELL_H * max(1, SCALE) + LINE_SP
 
-    y = 40
-    if sd_manager.mounted:
-        detalles = sd_manager.detalles_tarjeta()
-        if detalles:
-            g, _ = make_line(display, y_px=y,   fg=color.green,  text=f"Capacidad: {detalles['capacidad_total']:.2f} MB", scale=SCALE); splash.append(g); y += line_step
-            g, _ = make_line(display, y_px=y,   fg=color.cyan,   text=f"Libre:     {detalles['espacio_libre']:.2f} MB",   scale=SCALE); splash.append(g); y += line_step
-            g, _ = make_line(display, y_px=y,   fg=color.yellow, text=f"Usado:     {detalles['espacio_utilizado']:.2f} MB", scale=SCALE); splash.append(g); y += line_step + (LINE_SP * 2)
+        # Capacidad, libre, usado, "Archivos:" y después los archivos que entren
+        y = 40
+        for extra in (0, 0, LINE_SP * 2, 0):
+            self._nueva_linea(y)
+            y += line_step + extra
+        while y + (CELL_H * max(1, SCALE)) <= display.height:
+            self._nueva_linea(y)
+            y += line_step
 
-            g, _ = make_line(display, y_px=y,   fg=color.orange, text="Archivos:", scale=SCALE); splash.append(g); y += line_step
+    def _nueva_linea(self, y):
+        g, _ = make_line(self.display, y_px=y, fg=color.white, scale=SCALE)
+        self.splash.append(g)
+        self.lineas.append([g[0], "", color.white])
 
-            # Listado de archivos (controlando el borde inferior con la altura escalada)
-            for nombre in detalles.get("archivos", []):
-                if y + (CELL_H * max(1, SCALE)) > display.height:
-                    break
-                g, _ = make_line(display, y_px=y, fg=color.white, text=f"  {nombre}", scale=SCALE)
-                splash.append(g); y += line_step
+    def escribir(self, n, texto, fg=color.white):
+        """Pone texto en la línea n tocando solo las celdas distintas."""
+        linea = self.lineas[n]
+        grid, viejo, fg_viejo = linea
+        if fg != fg_viejo:
+            grid.pixel_shader[1] = fg
+            linea[2] = fg
+            self._cambios = True
+        texto = texto[:grid.width]
+        if texto == viejo:
+            return
+        for col in range(max(len(texto), len(viejo))):
+            c = texto[col] if col < len(texto) else " "
+            if col < len(viejo) and viejo[col] == c:
+                continue
+            if col >= len(viejo) and c == " ":
+                continue
+            glifo = FONT.get_glyph(ord(c))
+            if glifo is None:
+                glifo = FONT.get_glyph(ord("?"))  # la fuente no tiene ese carácter
+            grid[col, 0] = glifo.tile_index
+        linea[1] = texto
+        self._cambios = True
+
+    def actualizar(self, detalles, montada=True):
+        """Vuelca detalles (de detalles_tarjeta) en pantalla y refresca si hizo falta."""
+        if montada is None:
+            textos = [("Buscando tarjeta SD...", color.yellow)]
+        elif not montada:
+            textos = [("SD no montada.", color.red)]
+        elif not detalles:
+            textos = [("No se pudo obtener info.", color.red)]
         else:
-            g, _ = make_line(display, y_px=y, fg=color.red, text="No se pudo obtener info.", scale=SCALE)
-            splash.append(g)
+            textos = [
+                (f"Capacidad: {detalles['capacidad_total']:.2f} MB", color.green),
+                (f"Libre:     {detalles['espacio_libre']:.2f} MB", color.cyan),
+                (f"Usado:     {detalles['espacio_utilizado']:.2f} MB", color.yellow),
+                ("Archivos:", color.orange),
+            ]
+            for nombre in detalles.get("archivos", []):
+                if nombre.startswith("."):
+                    continue  # archivos de control, p. ej. .contador
+                textos.append((f"  {nombre}", color.white))
+        for n in range(len(self.lineas)):
+            if n < len(textos):
+                self.escribir(n, textos[n][0], textos[n][1])
+            else:
+                self.escribir(n, "", self.lineas[n][2])
+        self.refrescar()
+
+    def mostrar(self):
+        if self.display.root_group is not self.splash:
+            self.display.root_group = self.splash
+            self._cambios = True
+        self.refrescar()
+
+    def refrescar(self):
+        """Un solo refresh si hubo cambios (y solo si auto_refresh está apagado)."""
+        if self.display.root_group is not self.splash:
+            return  # todavía no se muestra; mostrar() refresca
+        if self._cambios and not self.display.auto_refresh:
+            self.display.refresh()
+        self._cambios = False
+
+
+pantalla = None
+
+def mostrar_sd_info(esperar_sd=True):
+    """esperar_sd=False dibuja sin tocar la SD (primer cuadro del arranque)."""
+    global pantalla
+    if not hasattr(board, "DISPLAY"):
+        print("Objeto DISPLAY no encontrado.")
+        return
+
+    if pantalla is None:
+        pantalla = PantallaSD(board.DISPLAY)
+    if esperar_sd or sd_manager.mounted:
+        montada = sd_manager.disponible()
+        detalles = sd_manager.detalles_tarjeta() if montada else None
     else:
-        g, _ = make_line(display, y_px=y, fg=color.red, text="SD no montada.", scale=SCALE)
-        splash.append(g)
+        montada, detalles = (False if sd_probada else None), None
+    pantalla.actualizar(detalles, montada=montada)
+    pantalla.mostrar()
+
+# ---------------------- asyncio ----------------------
+async def crear_archivo_incremental_async(sd_async):
+    """Como crear_archivo_incremental, pero la escritura cede entre bloques."""
+    global sd_probada
+    montada = await sd_async.montar()
+    sd_probada = True
+    if not montada:
+        print("La tarjeta SD no está montada.")
+        return
+    nombre = siguiente_nombre_incremental(base="archivo", ext="txt", carpeta="/")
+    contenido = "Hola, este es un archivo creado desde CircuitPython.\n"
+    if await sd_async.crear(nombre, contenido):
+        print(f"Archivo '{nombre}' creado con éxito.")
+    else:
+        print(f"Error al crear el archivo incremental: {sd_manager.estado[1]}")
+
+async def tarea_pantalla(cada_s=5.0):
+    """Redibuja cada tanto; solo refresca si algo cambió."""
+    if not hasattr(board, "DISPLAY"):
+        return
+    while True:
+        mostrar_sd_info(esperar_sd=False)
+        await asyncio.sleep(cada_s)
 
-    display.root_group = splash
-    print("Información mostrada en el display.")
+async def main():
+    pantalla_task = asyncio.create_task(tarea_pantalla())
+    await crear_archivo_incremental_async(SDAsincrono(sd_manager))
+    mostrar_sd_info(esperar_sd=False)  # apenas está la SD, sin esperar al próximo ciclo
+    await pantalla_task
 
 # ---------------------- run ----------------------
-crear_archivo_incremental()
-mostrar_sd_info()
+if asyncio is not None:
+    asyncio.run(main())
+else:
+    mostrar_sd_info(esperar_sd=False)  # primer cuadro sin esperar a la SD
+    crear_archivo_incremental()        # acá se monta la SD
+    mostrar_sd_info()
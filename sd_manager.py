@@ -3,25 +3,272 @@ import busio
 import sdcardio
 import storage
 import os
+import time
+import struct
+from array import array
+
+try:
+    from binascii import crc32 as _crc32
+except ImportError:
+    _crc32 = None
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None  # sin la biblioteca asyncio: SDAsincrono no está disponible
+
+_EXDEV = 18  # errno de "otro dispositivo" (rename entre volúmenes)
+_ENOENT = 2
+_EIO = 5
+_ENODEV = 19
+_EEXIST = 17
+_ETIMEDOUT = 110
+
+# Niveles de informe (SDManager.informe)
+SILENCIO = 0  # no escribe nada
+ERRORES = 1   # solo fallos
+DETALLE = 2   # también cada operación que sale bien (lo de siempre)
+
+# Códigos de SDManager.estado
+OK = 0
+NO_MONTADA = 1
+NO_EXISTE = 2
+YA_EXISTE = 3
+FUERA_DE_RANGO = 4
+ERROR = 5
+ERROR_IO = 6  # la tarjeta no respondió (se sacó, falso contacto)
+
+
+def _errno(e):
+    """errno de un OSError (en CircuitPython viene en args[0])."""
+    n = getattr(e, "errno", None)
+    if n is None and e.args:
+        n = e.args[0]
+    return n
+
+
+def _coincide(nombre, patron):
+    """Glob simple para nombres: '*' cualquier tira, '?' un carácter."""
+    i = j = 0
+    estrella = -1
+    marca = 0
+    while i < len(nombre):
+        if j < len(patron) and (patron[j] == "?" or patron[j] == nombre[i]):
+            i += 1
+            j += 1
+        elif j < len(patron) and patron[j] == "*":
+            estrella = j
+            marca = i
+            j += 1
+        elif estrella >= 0:
+            j = estrella + 1
+            marca += 1
+            i = marca
+        else:
+            return False
+    while j < len(patron) and patron[j] == "*":
+        j += 1
+    return j == len(patron)
+
+
+def _crc(datos):
+    """CRC32 si hay binascii; si no, Adler-32 (alcanza para detectar cortes)."""
+    if _crc32 is not None:
+        return _crc32(datos) & 0xFFFFFFFF
+    a, b = 1, 0
+    for x in datos:
+        a = (a + x) % 65521
+        b = (b + a) % 65521
+    return (b << 16) | a
+
+
+# Registro binario: b"SDR1" + "formato|campo,campo,...|delta\n" y después
+# las filas de ancho fijo (ver RegistroBinario)
+_BIN_MAGIC = b"SDR1"
+_BIN_DELTAS = "BHILQ"  # tipos sin signo que puede usar el delta del tiempo
+
+
+def _cabecera_binaria(f):
+    """Lee la cabecera de un registro binario: (formato, campos, delta)."""
+    if f.read(4) != _BIN_MAGIC:
+        raise ValueError("no es un registro binario")
+    formato, campos, delta = f.readline().decode().rstrip("\n").split("|")
+    return formato, campos.split(","), delta == "1"
+
+
+def _filas_binario(f, formato, delta, tam=512, fin=None):
+    """
+    Decodifica las filas que siguen a la cabecera leyendo por bloques en un
+    único buffer. Con delta reconstruye el tiempo absoluto. Una fila cortada
+    al final (corte de luz a mitad de escritura) se ignora; si se pasa una
+    lista fin, fin[0] queda en el byte donde termina la última fila entera
+    (contado desde donde estaba f).
+    """
+    fila = struct.calcsize(formato)
+    tipo_t = formato[:2]
+    maximo = (1 << (8 * struct.calcsize(tipo_t))) - 1
+    buf = bytearray(max(tam // fila, 1) * fila + 8)
+    mv = memoryview(buf)
+    n = p = 0
+    t = 0
+    antes = 0  # bytes ya descartados del principio del buffer
+    while True:
+        falta = fila
+        if delta and n - p >= fila and struct.unpack_from(tipo_t, buf, p)[0] == maximo:
+            falta += 8  # fila con el tiempo absoluto atrás
+        if n - p < falta:
+            buf[:n - p] = buf[p:n]  # lo que sobró pasa al principio
+            antes += p
+            n -= p
+            p = 0
+            k = f.readinto(mv[n:])
+            if not k:
+                return
+            n += k
+            continue
+        valores = struct.unpack_from(formato, buf, p)
+        p += fila
+        if delta:
+            if valores[0] == maximo:
+                t = struct.unpack_from("<q", buf, p)[0]
+                p += 8
+            else:
+                t += valores[0]
+            valores = (t,) + valores[1:]
+        if fin is not None:
+            fin[0] = antes + p
+        yield valores
+
+
+def _sincronizar(f):
+    """Baja el archivo a la tarjeta (en CircuitPython flush ya hace f_sync)."""
+    f.flush()
+    if hasattr(os, "fsync") and hasattr(f, "fileno"):
+        os.fsync(f.fileno())
+
+
+def _reintento(metodo):
+    """
+    Si la operación falla por un error de E/S de la tarjeta (se sacó y se
+    volvió a poner, falso contacto), remonta y la repite una sola vez.
+    Actúa solo en la llamada de más afuera, no en las anidadas.
+    """
+    def envuelto(self, *args, **kwargs):
+        if self._anidado:
+            return metodo(self, *args, **kwargs)
+        self._anidado = True
+        try:
+            self._io_fallida = False
+            r = metodo(self, *args, **kwargs)
+            if self._io_fallida and self.remontar():
+                self._io_fallida = False
+                r = metodo(self, *args, **kwargs)
+        finally:
+            self._anidado = False
+        return r
+    return envuelto
+
+
+class MemoriaAvisos:
+    """
+    Salida para SDManager que guarda los últimos n avisos en RAM en lugar
+    de mandarlos por la consola USB. lineas() los devuelve en orden.
+    """
+
+    def __init__(self, n=32):
+        self._avisos = [None] * n
+        self._i = 0
+        self.total = 0
+
+    def __call__(self, texto):
+        self._avisos[self._i] = texto
+        self._i = (self._i + 1) % len(self._avisos)
+        self.total += 1
+
+    def lineas(self):
+        orden = self._avisos[self._i:] + self._avisos[:self._i]
+        return [a for a in orden if a is not None]
+
+    def volcar(self, salida=print):
+        """Manda lo guardado a otra salida (por defecto la consola) y vacía."""
+        for linea in self.lineas():
+            salida(linea)
+        self.limpiar()
+
+    def limpiar(self):
+        self._avisos = [None] * len(self._avisos)
+        self._i = 0
+        self.total = 0
+
 
 class SDManager:
-    def __init__(self, mount_point="/sd"):
-        """Inicializa y monta la tarjeta SD en el RP2040."""
+    def __init__(self, mount_point="/sd", recuperar=1, informe=DETALLE, salida=print, baudrate=None,
+                 perezoso=False, reintento_s=2.0):
+        """
+        Inicializa y monta la tarjeta SD en el RP2040.
+        recuperar: profundidad hasta la que se buscan temporales que dejó un
+        corte de luz (ver recuperar()). 1 = solo la raíz, que cuesta un
+        listado que después se reutiliza; None = toda la tarjeta; 0 = no buscar.
+        informe: SILENCIO, ERRORES o DETALLE. salida: función que recibe
+        cada aviso (print, un MemoriaAvisos, ...).
+        Sea cual sea el nivel, self.estado guarda (código, mensaje) del
+        último aviso y los métodos que modifican la tarjeta devuelven
+        True/False.
+        baudrate: reloj SPI de la SD; None deja el de sdcardio (ver
+        sondear_baudrate()).
+        perezoso=True no toca la tarjeta acá: se monta en el primer uso, así
+        el arranque (y la pantalla) no espera a la SD. Si no hay tarjeta, se
+        vuelve a intentar en cada uso, como mucho cada reintento_s segundos.
+        """
         self.mount_point = mount_point
+        self.informe = informe
+        self.salida = salida
+        self.estado = (OK, None)
         self.spi = busio.SPI(board.SD_SCK, board.SD_MOSI, board.SD_MISO)
         self.cs = board.SD_CS
+        self.baudrate = baudrate
+        self.sd = None
         self.mounted = False
-        try:
-            self.sd = sdcardio.SDCard(self.spi, self.cs)
-            self.vfs = storage.VfsFat(self.sd)
-            storage.mount(self.vfs, self.mount_point)
-            self.mounted = True
-            print("Tarjeta SD montada con éxito en", self.mount_point)
-        except Exception as e:
-            print("Error al inicializar la tarjeta SD:", e)
+        self.reintento_s = reintento_s
+        self._recuperar = recuperar
+        self._ultimo_intento = None
+        self._sector = None
+        self._anidado = False
+        self._io_fallida = False
+        self._indices = {}
+        self._contadores = {}  # carpeta -> {(base, ext): último número usado}
+        self._dirs = {}        # caché de directorios: ruta -> (nombres, {nombre: (es_dir, tam)})
+        self._dirs_orden = []
+        self.fs_llamadas = 0   # llamadas reales a os.* (cada una va por SPI)
+        self.fs_ahorradas = 0  # las que respondió la caché
+        self._slots = {}       # ruta -> (secuencia, slot) de escribir_slot
+        if not perezoso:
+            self.disponible()
 
     # ---------------------- Helpers ----------------------
 
+    def _listo(self, mensaje):
+        self.estado = (OK, mensaje)
+        if self.informe >= DETALLE:
+            self.salida(mensaje)
+
+    def _fallo(self, codigo, mensaje, e=None):
+        if e is not None:
+            if codigo == ERROR:
+                n = _errno(e)
+                if n == _ENOENT:
+                    codigo = NO_EXISTE
+                elif n == _EEXIST:
+                    codigo = YA_EXISTE
+                elif n in (_EIO, _ENODEV, _ETIMEDOUT):
+                    codigo = ERROR_IO
+            mensaje = f"{mensaje} {e}"
+        if codigo == ERROR_IO:
+            self._io_fallida = True
+        self.estado = (codigo, mensaje)
+        if self.informe >= ERRORES:
+            self.salida(mensaje)
+
     def _path(self, ruta):
         if ruta.startswith(self.mount_point):
             return ruta
@@ -31,262 +278,1399 @@ class SDManager:
 
     def existe(self, ruta):
         """Devuelve True si existe archivo o carpeta."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
-            return False
-        try:
-            os.stat(self._path(ruta))
-            return True
-        except OSError:
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
             return False
+        return self._info(self._path(ruta)) is not None
 
     def es_directorio(self, ruta):
         """True si la ruta es un directorio."""
+        info = self._info(self._path(ruta))
+        return info is not None and info[0]
+
+    # ---------------------- Caché de directorios ----------------------
+    # Cada os.stat/os.listdir es un ida y vuelta por SPI. Se guarda el
+    # listado de los últimos directorios leídos con el tipo y tamaño de cada
+    # entrada; los métodos que modifican la tarjeta invalidan lo que tocan.
+    # Lo que se escriba por fuera de SDManager no se ve: olvidar_cache().
+
+    _MAX_DIRS = 16
+
+    def _entradas(self, dir_abs):
+        """
+        (nombres, {nombre: (es_dir, tam)}) de un directorio, desde la caché
+        si está. Con os.ilistdir el tipo y el tamaño vienen en el listado;
+        sin él la entrada queda en None y _info la completa con un os.stat
+        la primera vez que se necesita.
+        """
+        dir_abs = dir_abs.rstrip("/") or "/"
+        ent = self._dirs.get(dir_abs)
+        if ent is not None:
+            self.fs_ahorradas += 1
+            return ent
+        nombres = []
+        tabla = {}
+        ilistdir = getattr(os, "ilistdir", None)
+        if ilistdir is not None:
+            self.fs_llamadas += 1
+            for e in ilistdir(dir_abs):
+                tabla[e[0]] = (e[1] == 0x4000, e[3] if len(e) > 3 else -1)
+                nombres.append(e[0])
+        else:
+            self.fs_llamadas += 1
+            for nombre in os.listdir(dir_abs):
+                tabla[nombre] = None
+                nombres.append(nombre)
+        if len(self._dirs_orden) >= self._MAX_DIRS:
+            self._dirs.pop(self._dirs_orden.pop(0), None)
+        ent = (nombres, tabla)
+        self._dirs[dir_abs] = ent
+        self._dirs_orden.append(dir_abs)
+        return ent
+
+    def _info(self, full):
+        """
+        (es_dir, tam) de una ruta absoluta, o None si no existe.
+        Responde desde el listado del padre si está en caché. Si no está y
+        hay os.ilistdir, lista el padre (una llamada que sirve para los
+        hermanos); si no, hace un único os.stat.
+        """
+        full = full.rstrip("/")
+        k = full.rfind("/")
+        padre = full[:k] or "/"
+        ent = self._dirs.get(padre)
+        if ent is None and full != self.mount_point and hasattr(os, "ilistdir"):
+            try:
+                ent = self._entradas(padre)
+            except OSError:
+                return None
+        nombre = full[k + 1:]
+        if ent is not None:
+            if nombre not in ent[1]:
+                self.fs_ahorradas += 1
+                return None
+            info = ent[1][nombre]
+            if info is not None:
+                self.fs_ahorradas += 1
+                return info
+        self.fs_llamadas += 1
         try:
-            s = os.stat(self._path(ruta))
-            # 0x4000 suele indicar directorio en CircuitPython
-            return (s[0] & 0x4000) != 0
+            st = os.stat(full or "/")
         except OSError:
-            return False
+            return None
+        # 0x4000 suele indicar directorio en CircuitPython
+        info = ((st[0] & 0x4000) != 0, st[6])
+        if ent is not None:
+            ent[1][nombre] = info
+        return info
+
+    def _invalidar(self, *rutas):
+        """Olvida el directorio padre de cada ruta y, si era carpeta, todo lo de abajo."""
+        for full in rutas:
+            full = full.rstrip("/")
+            k = full.rfind("/")
+            self._olvidar_dir(full[:k] or "/")
+            abajo = full + "/"
+            for d in [d for d in self._dirs_orden if d == full or d.startswith(abajo)]:
+                self._olvidar_dir(d)
+
+    def _anotar(self, full, es_dir, tam):
+        """Write-through: si el padre está en caché, agrega/actualiza la entrada."""
+        k = full.rstrip("/").rfind("/")
+        ent = self._dirs.get(full[:k] or "/")
+        if ent is None:
+            return
+        nombre = full[k + 1:].rstrip("/")
+        if nombre not in ent[1]:
+            ent[0].append(nombre)
+        ent[1][nombre] = (es_dir, tam)
+
+    def _olvidar_dir(self, d):
+        if self._dirs.pop(d, None) is not None:
+            self._dirs_orden.remove(d)
+
+    def olvidar_cache(self):
+        """Vacía la caché de directorios (p. ej. si se escribió con open() directo)."""
+        self._dirs = {}
+        self._dirs_orden = []
+
+    def estadisticas_cache(self):
+        """Llamadas reales al sistema de archivos y las que se ahorró la caché."""
+        return {
+            "llamadas": self.fs_llamadas,
+            "ahorradas": self.fs_ahorradas,
+            "directorios": len(self._dirs_orden),
+        }
 
     # ---------------------- Listado ----------------------
 
+    @_reintento
     def listar(self, ruta="/"):
         """Lista nombres en una ruta (no recursivo)."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
             return []
         try:
-            return os.listdir(self._path(ruta))
+            return list(self._entradas(self._path(ruta))[0])
         except Exception as e:
-            print("Error al listar:", e)
+            self._fallo(ERROR, "Error al listar:", e)
             return []
 
     def listar_recursivo(self, ruta="/"):
         """Genera tuplas (ruta_relativa, es_directorio) de forma recursiva."""
-        base = self._path(ruta)
-        try:
-            for nombre in os.listdir(base):
-                full = base + ("" if base.endswith("/") else "/") + nombre
-                rel = full[len(self.mount_point):]
-                isdir = self.es_directorio(rel)
-                yield rel, isdir
-                if isdir:
-                    for sub in self.listar_recursivo(rel):
-                        yield sub
+        for rel, isdir, _ in self.recorrer(ruta):
+            yield rel, isdir
+
+    def recorrer(self, ruta="/", orden="pre", max_prof=None, patron=None, tamanos=False):
+        """
+        Recorre el árbol con una pila explícita (sin recursión ni un
+        generador por nivel) y genera (ruta_relativa, es_dir, tam).
+        orden="pre": cada carpeta sale antes que su contenido.
+        orden="post": después; sirve para borrar y para sumar tamaños.
+        max_prof: 1 = solo el contenido directo de ruta.
+        patron: filtro tipo glob sobre el nombre ("*.csv", "log_??.txt");
+        no corta el descenso, solo lo que se entrega.
+        tamanos=True: en post-orden cada carpeta trae el total de lo que
+        tiene abajo (en pre-orden las carpetas van con 0).
+        """
+        base = self._path(ruta).rstrip("/") or "/"
+        post = orden == "post"
+        try:
+            # cada marco: [ruta_abs, nombres, siguiente, profundidad, total]
+            pila = [[base, list(self._entradas(base)[0]), 0, 1, 0]]
+            while pila:
+                marco = pila[-1]
+                full, nombres, i, prof = marco[0], marco[1], marco[2], marco[3]
+                if i == len(nombres):
+                    pila.pop()
+                    if pila:
+                        pila[-1][4] += marco[4]
+                        if post and (patron is None or _coincide(full[full.rfind("/") + 1:], patron)):
+                            yield full[len(self.mount_point):], True, marco[4]
+                    continue
+                marco[2] = i + 1
+                nombre = nombres[i]
+                entrega = patron is None or _coincide(nombre, patron)
+                if not entrega and max_prof is not None and prof >= max_prof:
+                    continue  # ni se entrega ni se baja: no hace falta su stat
+                hijo = full + "/" + nombre if full != "/" else "/" + nombre
+                info = self._info(hijo)
+                if info is None:
+                    continue
+                es_dir, tam = info
+                if es_dir:
+                    if max_prof is None or prof < max_prof:
+                        if not post and entrega:
+                            yield hijo[len(self.mount_point):], True, 0
+                        pila.append([hijo, list(self._entradas(hijo)[0]), 0, prof + 1, 0])
+                    elif entrega:
+                        yield hijo[len(self.mount_point):], True, 0
+                    continue
+                if tamanos and tam < 0:
+                    tam = os.stat(hijo)[6]
+                marco[4] += tam
+                if entrega:
+                    yield hijo[len(self.mount_point):], False, tam
         except Exception as e:
-            print("Error en listado recursivo:", e)
+            self._fallo(ERROR, "Error en listado recursivo:", e)
+
+    @_reintento
+    def du(self, ruta="/", max_prof=1):
+        """
+        Uso por carpeta, estilo du: una pasada en post-orden sumando
+        tamaños. Informa las carpetas hasta max_prof niveles debajo de ruta
+        (None = todas) y al final el total de ruta.
+        Devuelve una lista de (ruta, bytes).
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return []
+        raiz = self._path(ruta).rstrip("/")[len(self.mount_point):]
+        nivel = raiz.count("/")
+        informe = []
+        total = 0
+        for rel, es_dir, tam in self.recorrer(ruta, orden="post", tamanos=True):
+            if not es_dir:
+                total += tam
+            elif max_prof is None or rel.count("/") - nivel <= max_prof:
+                informe.append((rel, tam))
+        informe.append((raiz or "/", total))
+        for r, t in informe:
+            self._listo(f"{t:>10}  {r}")
+        return informe
 
     # ---------------------- Archivos ----------------------
 
+    @_reintento
     def crear_archivo(self, nombre, contenido=""):
         """Crea un archivo nuevo. Falla si ya existe."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
-            return
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
         try:
             with open(self._path(nombre), "x") as f:
                 if contenido:
                     f.write(contenido)
-            print(f"Archivo '{nombre}' creado.")
+            self._anotar(self._path(nombre), False, len(contenido.encode()))
+            self._listo(f"Archivo '{nombre}' creado.")
+            return True
         except Exception as e:
-            print(f"Error al crear '{nombre}':", e)
+            self._fallo(ERROR, f"Error al crear '{nombre}':", e)
+            return False
 
-    def escribir_archivo(self, nombre, contenido):
-        """Sobrescribe un archivo con contenido."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
-            return
+    @_reintento
+    def escribir_archivo(self, nombre, contenido, atomico=False):
+        """
+        Sobrescribe un archivo con contenido.
+        atomico=True escribe primero un temporal, lo sincroniza y recién
+        entonces lo pone en lugar del original: un corte de luz deja la
+        versión vieja o la nueva, nunca un archivo vacío o a medias.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
         try:
-            with open(self._path(nombre), "w") as f:
-                f.write(contenido)
-            print(f"Archivo '{nombre}' escrito con éxito.")
+            ruta = self._path(nombre)
+            if atomico:
+                tmp = ruta + ".tmp~"
+                with open(tmp, "w") as f:
+                    f.write(contenido)
+                    _sincronizar(f)
+                self._reemplazar_con(tmp, ruta)
+            else:
+                with open(ruta, "w") as f:
+                    f.write(contenido)
+            self._anotar(ruta, False, len(contenido.encode()))
+            self._olvidar_indice(nombre)
+            self._listo(f"Archivo '{nombre}' escrito con éxito.")
+            return True
         except Exception as e:
-            print(f"Error al escribir '{nombre}':", e)
+            self._fallo(ERROR, f"Error al escribir '{nombre}':", e)
+            return False
 
+    @_reintento
     def anexar_archivo(self, nombre, contenido):
         """Añade contenido al final del archivo."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
-            return
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
         try:
             with open(self._path(nombre), "a") as f:
                 f.write(contenido)
-            print(f"Contenido anexado a '{nombre}'.")
+            self._invalidar(self._path(nombre))
+            self._listo(f"Contenido anexado a '{nombre}'.")
+            return True
         except Exception as e:
-            print(f"Error al anexar en '{nombre}':", e)
+            self._fallo(ERROR, f"Error al anexar en '{nombre}':", e)
+            return False
 
+    @_reintento
     def leer_archivo(self, nombre):
         """Lee todo el archivo como texto."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
             return None
         try:
             with open(self._path(nombre), "r") as f:
                 data = f.read()
-            print(f"Contenido de '{nombre}':\n{data}")
+            self._listo(f"Contenido de '{nombre}':\n{data}")
             return data
         except Exception as e:
-            print(f"Error al leer '{nombre}':", e)
+            self._fallo(ERROR, f"Error al leer '{nombre}':", e)
             return None
 
+    @_reintento
     def leer_lineas(self, nombre):
         """Devuelve lista de líneas."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
             return []
         try:
             with open(self._path(nombre), "r") as f:
                 return f.readlines()
         except Exception as e:
-            print(f"Error al leer líneas de '{nombre}':", e)
+            self._fallo(ERROR, f"Error al leer líneas de '{nombre}':", e)
             return []
 
-    def editar_linea(self, nombre, numero_linea, nuevo_texto, mantener_salto=True):
+    # ---------------------- Índice de líneas ----------------------
+
+    @_reintento
+    def indice(self, nombre, cada=64, guardar=True):
+        """
+        Devuelve el IndiceLineas del archivo, al día con su tamaño actual.
+        Lo toma de memoria o de '<nombre>.idx' y solo lee lo que el archivo
+        creció desde entonces. Si el archivo se achicó, lo rehace.
+        guardar=True escribe el .idx cuando hubo cambios.
+        """
+        ruta = self._path(nombre)
+        idx = self._indices.get(ruta)
+        if idx is None or idx.cada != cada:
+            idx = IndiceLineas.cargar(ruta + ".idx")
+            if idx is None or idx.cada != cada:
+                idx = IndiceLineas(cada)
+            self._indices[ruta] = idx
+        if idx.escritor is not None:
+            # un Registro abierto lo alimenta al pasarle el buffer al archivo:
+            # bajarlo, así lo que dice el índice ya se puede leer
+            idx.escritor.flush()
+        elif idx.actualizar(ruta) and guardar:
+            try:
+                idx.guardar(ruta + ".idx")
+                self._invalidar(ruta + ".idx")
+            except OSError as e:
+                self._fallo(ERROR, f"No se pudo guardar el índice de '{nombre}':", e)
+        return idx
+
+    def _olvidar_indice(self, nombre):
+        """Descarta el índice (memoria y .idx) de un archivo que se reescribió."""
+        ruta = self._path(nombre)
+        self._indices.pop(ruta, None)
+        if self._info(ruta + ".idx") is None:
+            return
+        try:
+            os.remove(ruta + ".idx")
+            self._invalidar(ruta)
+        except OSError:
+            pass
+
+    @_reintento
+    def leer_rango(self, nombre, desde, hasta, cada=64):
+        """
+        Líneas desde..hasta (1-based, ambas incluidas), con su salto, como
+        leer_lineas. Va directo al punto indexado más cercano en lugar de
+        leer el archivo desde el principio.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return []
+        try:
+            idx = self.indice(nombre, cada)
+            desde = max(desde, 1)
+            hasta = min(hasta, idx.total)
+            if desde > hasta:
+                return []
+            offset, n = idx.ubicar(desde)
+            lineas = []
+            for linea in self._lineas_desde(self._path(nombre), offset):
+                if n >= desde:
+                    lineas.append(linea.decode())
+                    if n == hasta:
+                        break
+                n += 1
+            return lineas
+        except Exception as e:
+            self._fallo(ERROR, f"Error al leer líneas de '{nombre}':", e)
+            return []
+
+    def leer_linea(self, nombre, numero, cada=64):
+        """Línea N (1-based) con su salto, o None si no existe."""
+        lineas = self.leer_rango(nombre, numero, numero, cada)
+        return lineas[0] if lineas else None
+
+    @_reintento
+    def tail(self, nombre, n=10, cada=64):
+        """Últimas n líneas del archivo."""
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return []
+        total = self.indice(nombre, cada).total
+        return self.leer_rango(nombre, total - n + 1, total, cada)
+
+    def _lineas_desde(self, ruta, offset=0, tam=512):
+        """
+        Genera las líneas (bytes, con su salto) a partir de un offset.
+        Lee con readinto sobre un único bytearray; solo se crea un objeto
+        nuevo por línea entregada.
+        """
+        buf = bytearray(tam)
+        mv = memoryview(buf)
+        with open(ruta, "rb") as f:
+            if offset:
+                f.seek(offset)
+            resto = None
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                i = 0
+                while True:
+                    j = buf.find(b"\n", i, n)
+                    if j < 0:
+                        break
+                    if resto is None:
+                        yield bytes(mv[i:j + 1])
+                    else:
+                        resto += mv[i:j + 1]
+                        yield bytes(resto)
+                        resto = None
+                    i = j + 1
+                if i < n:
+                    if resto is None:
+                        resto = bytearray(mv[i:n])
+                    else:
+                        resto += mv[i:n]
+            if resto:
+                yield bytes(resto)
+
+    # ---------------------- Lectura por partes ----------------------
+
+    def iterar_lineas(self, nombre, desde=0, binario=False, tam=512):
+        """
+        Generador de líneas (con su salto) sin cargar el archivo en RAM.
+        desde es un offset en bytes para retomar una lectura: con
+        binario=True las líneas salen como bytes y el próximo offset es
+        desde + la suma de sus len().
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return
+        try:
+            for linea in self._lineas_desde(self._path(nombre), desde, tam):
+                yield linea if binario else linea.decode()
+        except OSError as e:
+            self._fallo(ERROR, f"Error al leer líneas de '{nombre}':", e)
+
+    def iterar_bloques(self, nombre, tam=512, desde=0):
+        """
+        Generador de bloques de hasta tam bytes desde el offset desde.
+        Entrega memoryviews sobre un único buffer que se reutiliza: copiar
+        con bytes(bloque) lo que haya que guardar después de la siguiente
+        vuelta.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return
+        buf = bytearray(tam)
+        mv = memoryview(buf)
+        try:
+            with open(self._path(nombre), "rb") as f:
+                if desde:
+                    f.seek(desde)
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    yield mv if n == tam else mv[:n]
+        except OSError as e:
+            self._fallo(ERROR, f"Error al leer '{nombre}':", e)
+
+    @_reintento
+    def editar_linea(self, nombre, numero_linea, nuevo_texto, mantener_salto=True, tam_bloque=None):
         """
         Reemplaza la línea N (1-based) por nuevo_texto.
         Por defecto conserva el salto de línea.
+        No carga el archivo: ubica la línea leyendo por bloques. Si el texto
+        nuevo mide lo mismo se escribe encima (seek + write); si no, se arma
+        un temporal y se renombra sobre el original.
         """
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
-            return
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
+        ruta = self._path(nombre)
+        tam = self._tam_bloque(tam_bloque, maximo=2048)
         try:
-            lineas = self.leer_lineas(nombre)
-            idx = numero_linea - 1
-            if idx < 0 or idx >= len(lineas):
-                print("Número de línea fuera de rango.")
-                return
+            lugar = self._ubicar_linea(ruta, numero_linea, tam)
+            if lugar is None:
+                self._fallo(FUERA_DE_RANGO, "Número de línea fuera de rango.")
+                return False
+            inicio, fin = lugar
             if mantener_salto and not nuevo_texto.endswith("\n"):
                 nuevo_texto = nuevo_texto + "\n"
-            lineas[idx] = nuevo_texto if mantener_salto else nuevo_texto.rstrip("\n")
-            with open(self._path(nombre), "w") as f:
-                f.writelines(lineas)
-            print(f"Línea {numero_linea} editada en '{nombre}'.")
+            nuevo = (nuevo_texto if mantener_salto else nuevo_texto.rstrip("\n")).encode()
+            if len(nuevo) == fin - inicio:
+                with open(ruta, "r+b") as f:
+                    f.seek(inicio)
+                    f.write(nuevo)
+            else:
+                tmp = ruta + ".tmp~"
+                with open(ruta, "rb") as fi, open(tmp, "wb") as fo:
+                    self._copiar_rango(fi, fo, inicio, tam)
+                    fo.write(nuevo)
+                    fi.seek(fin)
+                    self._copiar_rango(fi, fo, None, tam)
+                self._reemplazar_con(tmp, ruta)
+            self._olvidar_indice(nombre)
+            self._listo(f"Línea {numero_linea} editada en '{nombre}'.")
+            return True
         except Exception as e:
-            print(f"Error al editar línea en '{nombre}':", e)
+            self._fallo(ERROR, f"Error al editar línea en '{nombre}':", e)
+            return False
 
-    def reemplazar_texto(self, nombre, buscar, reemplazar, max_reemplazos=-1):
-        """Reemplaza texto en todo el archivo. max_reemplazos=-1 para todos."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
+    @_reintento
+    def reemplazar_texto(self, nombre, buscar, reemplazar, max_reemplazos=-1, tam_bloque=None):
+        """
+        Reemplaza texto en todo el archivo. max_reemplazos=-1 para todos.
+        Lee por bloques y guarda una cola de len(buscar)-1 bytes entre
+        bloques, así encuentra también lo que queda partido entre dos.
+        Si buscar y reemplazar miden lo mismo corrige en el lugar; si no,
+        escribe un temporal y lo renombra sobre el original.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
             return 0
+        ruta = self._path(nombre)
+        b = buscar.encode()
+        r = reemplazar.encode()
+        if not b:
+            return 0
+        tam = max(self._tam_bloque(tam_bloque, maximo=2048), len(b))
+        en_lugar = len(b) == len(r)
+        tmp = ruta + ".tmp~"
+        hechos = 0
         try:
-            data = self.leer_archivo(nombre)
-            if data is None:
-                return 0
-            total = data.count(buscar)
-            if max_reemplazos == -1:
-                nuevo = data.replace(buscar, reemplazar)
-                hechos = total
-            else:
-                nuevo = data.replace(buscar, reemplazar, max_reemplazos)
-                hechos = min(total, max_reemplazos)
-            self.escribir_archivo(nombre, nuevo)
-            print(f"Reemplazos realizados: {hechos}")
+            with open(ruta, "r+b" if en_lugar else "rb") as fi:
+                fo = None if en_lugar else open(tmp, "wb")
+                try:
+                    cola = b""
+                    base = 0  # offset en el archivo de cola[0]
+                    while True:
+                        bloque = fi.read(tam)
+                        datos = cola + bloque if cola else bloque
+                        p = 0
+                        while max_reemplazos < 0 or hechos < max_reemplazos:
+                            k = datos.find(b, p)
+                            if k < 0:
+                                break
+                            if en_lugar:
+                                leido = fi.tell()
+                                fi.seek(base + k)
+                                fi.write(r)
+                                fi.seek(leido)
+                            else:
+                                fo.write(datos[p:k])
+                                fo.write(r)
+                            p = k + len(b)
+                            hechos += 1
+                        if not bloque:
+                            if fo:
+                                fo.write(datos[p:])
+                            break
+                        corte = max(p, len(datos) - len(b) + 1)
+                        if fo:
+                            fo.write(datos[p:corte])
+                        cola = datos[corte:]
+                        base += corte
+                finally:
+                    if fo:
+                        fo.close()
+            if not en_lugar:
+                if hechos:
+                    self._reemplazar_con(tmp, ruta)
+                else:
+                    os.remove(tmp)
+            if hechos:
+                # también en el lugar: si buscar o reemplazar tienen saltos,
+                # las líneas se corren aunque el tamaño no cambie
+                self._olvidar_indice(nombre)
+            self._listo(f"Reemplazos realizados: {hechos}")
             return hechos
         except Exception as e:
-            print(f"Error al reemplazar texto en '{nombre}':", e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            self._fallo(ERROR, f"Error al reemplazar texto en '{nombre}':", e)
+            return 0
+
+    def _ubicar_linea(self, ruta, numero, tam):
+        """
+        (inicio, fin) en bytes de la línea N (1-based); fin incluye el salto.
+        None si la línea no existe.
+        """
+        if numero < 1:
+            return None
+        inicio = 0 if numero == 1 else None
+        visto = 1
+        pos = 0
+        with open(ruta, "rb") as f:
+            while True:
+                bloque = f.read(tam)
+                if not bloque:
+                    break
+                i = 0
+                while True:
+                    j = bloque.find(b"\n", i)
+                    if j < 0:
+                        break
+                    if visto == numero:
+                        return inicio, pos + j + 1
+                    visto += 1
+                    if visto == numero:
+                        inicio = pos + j + 1
+                    i = j + 1
+                pos += len(bloque)
+        if inicio is not None and pos > inicio:
+            return inicio, pos  # última línea, sin salto final
+        return None
+
+    def _copiar_rango(self, fi, fo, n, tam):
+        """Copia n bytes (None = hasta el final) de fi a fo con el buffer compartido."""
+        mv = memoryview(self._buffer(tam))
+        while n is None or n > 0:
+            leidos = fi.readinto(mv if n is None or n >= tam else mv[:n])
+            if not leidos:
+                break
+            fo.write(mv[:leidos])
+            if n is not None:
+                n -= leidos
+
+    def _reemplazar_con(self, tmp, ruta):
+        """
+        Pone tmp (ya completo) en lugar de ruta. FAT no renombra encima de
+        un archivo existente, así que tmp pasa antes a '.new~': si se corta
+        entre el remove y el rename, recuperar() sabe que '.new~' está entero.
+        """
+        if self._info(ruta) is None:
+            os.rename(tmp, ruta)
+        else:
+            nuevo = ruta + ".new~"
+            os.rename(tmp, nuevo)
+            os.remove(ruta)
+            os.rename(nuevo, ruta)
+        self._invalidar(ruta)
+
+    def recuperar(self, ruta="/", max_prof=None):
+        """
+        Limpia lo que deja un corte a mitad de una escritura segura:
+        '.tmp~' puede estar incompleto: se borra.
+        '.new~' está completo: reemplaza al original.
+        '.old~' (destino apartado por mover_archivo): vuelve a su lugar si
+        el original no llegó a ocuparse; si no, se borra.
+        Devuelve cuántos arregló.
+        """
+        arreglados = 0
+        for rel, es_dir, _ in list(self.recorrer(ruta, max_prof=max_prof, patron="*~")):
+            suf = rel[-5:]
+            if suf not in (".tmp~", ".new~", ".old~"):
+                continue
+            full = self._path(rel)
+            base = full[:-5]
+            try:
+                ocupado = self._info(base) is not None
+                if suf == ".tmp~" or (suf == ".old~" and ocupado):
+                    if es_dir:
+                        self.borrar_directorio(rel, recursivo=True)
+                    else:
+                        os.remove(full)
+                else:
+                    if ocupado:
+                        os.remove(base)
+                    os.rename(full, base)
+                    self._olvidar_indice(base)
+                self._invalidar(full)
+                arreglados += 1
+            except OSError as e:
+                self._fallo(ERROR, f"No se pudo recuperar '{rel}':", e)
+        if arreglados:
+            self._listo(f"Recuperados {arreglados} temporales en la SD.")
+        return arreglados
+
+    # ---------------------- Slots A/B ----------------------
+
+    @_reintento
+    def escribir_slot(self, nombre, contenido):
+        """
+        Escritura doble A/B para archivos chicos que se reescriben seguido
+        (configuración, estado). Alterna entre 'nombre.a' y 'nombre.b', cada
+        uno con un encabezado "secuencia largo crc"; el otro slot conserva
+        siempre la versión anterior completa. Sin rename ni remove, es el
+        modo más barato por escritura. Leer con leer_slot().
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
+        ruta = self._path(nombre)
+        datos = contenido.encode() if isinstance(contenido, str) else contenido
+        try:
+            actual = self._slots.get(ruta)
+            if actual is None:
+                actual = self._ultimo_slot(ruta)[:2]
+            seq, slot = actual
+            otro = "b" if slot == "a" else "a"
+            with open(ruta + "." + otro, "wb") as f:
+                f.write(f"{seq + 1} {len(datos)} {_crc(datos)}\n".encode())
+                f.write(datos)
+                _sincronizar(f)
+            self._slots[ruta] = (seq + 1, otro)
+            self._invalidar(ruta + "." + otro)
+            return True
+        except Exception as e:
+            self._fallo(ERROR, f"Error al escribir slot '{nombre}':", e)
+            return False
+
+    @_reintento
+    def leer_slot(self, nombre, binario=False):
+        """Última versión válida escrita con escribir_slot, o None."""
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return None
+        ruta = self._path(nombre)
+        seq, slot, datos = self._ultimo_slot(ruta)
+        if datos is None:
+            return None
+        self._slots[ruta] = (seq, slot)
+        return datos if binario else datos.decode()
+
+    def _ultimo_slot(self, ruta):
+        """(secuencia, slot, datos) del slot válido más nuevo; (0, None, None) si no hay."""
+        mejor = (0, None, None)
+        for slot in ("a", "b"):
+            try:
+                with open(ruta + "." + slot, "rb") as f:
+                    seq, largo, crc = [int(x) for x in f.readline().split()]
+                    datos = f.read(largo)
+            except (OSError, ValueError):
+                continue
+            if len(datos) == largo and _crc(datos) == crc and seq > mejor[0]:
+                mejor = (seq, slot, datos)
+        return mejor
+
+    def logger(self, nombre, tam_buffer=2048, intervalo_s=5.0, indice=None):
+        """
+        Devuelve un Registro que deja el archivo abierto y junta las líneas en
+        un buffer; ver Registro. Usar con 'with' o llamar a close() al final.
+        indice=K mantiene al día el índice de líneas (una marca cada K
+        líneas) mientras se escribe, para leer_linea/leer_rango/tail.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return None
+        try:
+            idx = self.indice(nombre, indice) if indice else None
+            return Registro(self, nombre, tam_buffer, intervalo_s, idx)
+        except Exception as e:
+            self._fallo(ERROR, f"Error al abrir registro '{nombre}':", e)
+            return None
+
+    def logger_binario(self, nombre, campos, formato, delta_t=False, tam_buffer=2048, intervalo_s=5.0):
+        """
+        Devuelve un RegistroBinario: filas de ancho fijo empaquetadas con
+        struct en vez de texto (ver RegistroBinario). campos son los nombres
+        (lista o "a,b,c") y formato el de struct sin orden de bytes, p. ej.
+        "Iff". Si el archivo ya existe tiene que tener el mismo formato.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return None
+        try:
+            return RegistroBinario(self, nombre, campos, formato, delta_t, tam_buffer, intervalo_s)
+        except Exception as e:
+            self._fallo(ERROR, f"Error al abrir registro '{nombre}':", e)
+            return None
+
+    def campos_binario(self, nombre):
+        """Nombres de los campos de un registro binario (None si no se puede leer)."""
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return None
+        try:
+            with open(self._path(nombre), "rb") as f:
+                return _cabecera_binaria(f)[1]
+        except Exception as e:
+            self._fallo(ERROR, f"Error al leer '{nombre}':", e)
+            return None
+
+    def leer_binario(self, nombre, tam=512):
+        """
+        Generador de filas (tuplas) de un registro binario, con el tiempo ya
+        reconstruido si se guardó como delta. Lee por bloques de unos tam
+        bytes sin cargar el archivo.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return
+        try:
+            with open(self._path(nombre), "rb") as f:
+                formato, _, delta = _cabecera_binaria(f)
+                for valores in _filas_binario(f, formato, delta, tam):
+                    yield valores
+        except Exception as e:
+            self._fallo(ERROR, f"Error al leer '{nombre}':", e)
+
+    @_reintento
+    def binario_a_csv(self, nombre, destino=None, sep=","):
+        """
+        Pasa un registro binario a texto: una línea con los campos y una por
+        fila. destino por defecto es el mismo nombre con extensión .csv (se
+        pisa si existe). Devuelve la cantidad de filas, o None si falla.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return None
+        if destino is None:
+            base = nombre.rsplit("/", 1)[-1]
+            destino = (nombre[:nombre.rfind(".")] if "." in base else nombre) + ".csv"
+        filas = 0
+        try:
+            with open(self._path(nombre), "rb") as f:
+                formato, campos, delta = _cabecera_binaria(f)
+                open(self._path(destino), "wb").close()
+                self._olvidar_indice(destino)
+                with Registro(self, destino, intervalo_s=None) as r:
+                    r.linea(*campos, sep=sep)
+                    for valores in _filas_binario(f, formato, delta):
+                        r.linea(*valores, sep=sep)
+                        filas += 1
+        except Exception as e:
+            self._fallo(ERROR, f"Error al convertir '{nombre}':", e)
+            return None
+        self._listo(f"'{nombre}' convertido a '{destino}' ({filas} filas).")
+        return filas
+
+    # ---------------------- Numeración de archivos ----------------------
+
+    _CONTADOR = ".contador"
+
+    @_reintento
+    def siguiente_nombre(self, base="archivo", ext="txt", carpeta="/", reservar=True):
+        """
+        Próximo nombre libre "base N.ext" en carpeta, sin listarla.
+        El último número usado de cada (base, ext) se guarda en
+        carpeta/.contador; basta con comprobar que "base N+1.ext" no exista.
+        Solo si falta el contador o quedó atrasado (alguien creó archivos
+        por fuera) se recorre la carpeta, como antes.
+        reservar=True anota el número, así dos llamadas seguidas no devuelven
+        el mismo nombre aunque todavía no se haya creado el archivo.
+        """
+        dir_abs = self._path(carpeta).rstrip("/") or "/"
+        pre = dir_abs + "/" if dir_abs != "/" else "/"
+        contadores = self._leer_contadores(dir_abs)
+        clave = (base, ext)
+        n = contadores.get(clave)
+        if n is None or self._info(f"{pre}{base} {n + 1}.{ext}") is not None:
+            n = self._mayor_numero(dir_abs, base, ext)
+        n += 1
+        if reservar:
+            contadores[clave] = n
+            self._guardar_contadores(dir_abs, contadores)
+        return f"{base} {n}.{ext}"
+
+    def _mayor_numero(self, dir_abs, base, ext):
+        """Recorre la carpeta y devuelve el N más alto de "base N.ext" (0 si no hay)."""
+        prefijo = f"{base} "
+        sufijo = f".{ext}"
+        max_n = 0
+        try:
+            nombres = self._entradas(dir_abs)[0]
+        except OSError:
             return 0
+        for nombre in nombres:
+            if not nombre.endswith(sufijo) or not nombre.startswith(prefijo):
+                continue
+            try:
+                n = int(nombre[len(prefijo):-len(sufijo)].strip())
+            except ValueError:
+                continue
+            if n > max_n:
+                max_n = n
+        return max_n
+
+    def _leer_contadores(self, dir_abs):
+        contadores = self._contadores.get(dir_abs)
+        if contadores is not None:
+            return contadores
+        contadores = {}
+        try:
+            with open(dir_abs.rstrip("/") + "/" + self._CONTADOR, "r") as f:
+                for linea in f:
+                    partes = linea.rstrip("\n").split("\t")
+                    if len(partes) == 3:
+                        contadores[(partes[0], partes[1])] = int(partes[2])
+        except (OSError, ValueError):
+            pass  # sin contador o corrupto: se rehace escaneando
+        self._contadores[dir_abs] = contadores
+        return contadores
+
+    def _guardar_contadores(self, dir_abs, contadores):
+        """Escribe el contador en un temporal y lo renombra encima: nunca queda a medias."""
+        ruta = dir_abs.rstrip("/") + "/" + self._CONTADOR
+        try:
+            with open(ruta + ".tmp~", "w") as f:
+                for (base, ext), n in contadores.items():
+                    f.write(f"{base}\t{ext}\t{n}\n")
+            self._reemplazar_con(ruta + ".tmp~", ruta)
+        except OSError as e:
+            self._fallo(ERROR, "No se pudo guardar el contador:", e)
 
     # ---------------------- Gestión de archivos ----------------------
 
+    @_reintento
     def renombrar_archivo(self, nombre_actual, nuevo_nombre):
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
-            return
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
         try:
             os.rename(self._path(nombre_actual), self._path(nuevo_nombre))
-            print(f"'{nombre_actual}' renombrado a '{nuevo_nombre}'.")
+            self._invalidar(self._path(nombre_actual), self._path(nuevo_nombre))
+            self._olvidar_indice(nombre_actual)
+            self._olvidar_indice(nuevo_nombre)
+            self._listo(f"'{nombre_actual}' renombrado a '{nuevo_nombre}'.")
+            return True
         except Exception as e:
-            print(f"Error al renombrar '{nombre_actual}':", e)
+            self._fallo(ERROR, f"Error al renombrar '{nombre_actual}':", e)
+            return False
 
-    def copiar_archivo(self, origen, destino, sobrescribir=False, tam_bloque=4096):
-        """Copia un archivo. No sobrescribe salvo que se indique."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
+    def _tam_bloque(self, pedido=None, maximo=8192):
+        """
+        Tamaño de bloque para copias: potencia de 2 entre 512 y 'maximo', sin
+        pasarse del pedido ni del cluster FAT (statvfs), así cada bloque cae
+        alineado a cluster.
+        """
+        if pedido is None:
+            try:
+                pedido = os.statvfs(self.mount_point)[0]
+            except Exception:
+                pedido = 4096
+        tam = 512
+        while tam * 2 <= min(pedido, maximo):
+            tam *= 2
+        return tam
+
+    def _buffer(self, tam):
+        """bytearray de copia reutilizable (uno por SDManager)."""
+        buf = getattr(self, "_buf_copia", None)
+        if buf is None or len(buf) != tam:
+            buf = bytearray(tam)
+            self._buf_copia = buf
+        return buf
+
+    @_reintento
+    def copiar_archivo(self, origen, destino, sobrescribir=False, tam_bloque=None, progreso=None):
+        """
+        Copia un archivo. No sobrescribe salvo que se indique.
+        Usa un único buffer reutilizable con readinto (no crea un bytes por
+        bloque). tam_bloque=None lo alinea al cluster de la tarjeta.
+        progreso(copiados, total) se llama después de cada bloque.
+        Devuelve (bytes_copiados, segundos) o None si falla.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return None
+        src = self._path(origen)
+        dst = self._path(destino)
+        if self.existe(destino) and not sobrescribir:
+            self._fallo(YA_EXISTE, f"Destino '{destino}' ya existe. Usa sobrescribir=True.")
+            return None
+        try:
+            total = os.stat(src)[6] if progreso else 0
+            copiados = 0
+            t0 = time.monotonic()
+            for copiados in self._pasos_copia(src, dst, self._tam_bloque(tam_bloque)):
+                if progreso:
+                    progreso(copiados, total)
+            self._anotar(dst, False, copiados)
+            dt = time.monotonic() - t0
+            self._listo(f"Copiado '{origen}' -> '{destino}' ({copiados} bytes en {dt:.2f} s).")
+            return copiados, dt
+        except Exception as e:
+            self._fallo(ERROR, f"Error al copiar '{origen}':", e)
+            return None
+
+    def _pasos_copia(self, src, dst, tam):
+        """Copia bloque a bloque con el buffer compartido; entrega lo copiado tras cada uno."""
+        self._olvidar_indice(dst)  # si dst ya existía, su índice deja de valer
+        buf = self._buffer(tam)
+        mv = memoryview(buf)
+        copiados = 0
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            while True:
+                n = fsrc.readinto(buf)
+                if not n:
+                    break
+                fdst.write(buf if n == len(buf) else mv[:n])
+                copiados += n
+                yield copiados
+
+    def escribir_por_partes(self, nombre, contenido, anexar=False, tam_bloque=None, crear=False):
+        """
+        Escribe (o anexa, con anexar=True) contenido de a un bloque por
+        next() y entrega los bytes escritos hasta ahí. Para Turnos o
+        SDAsincrono. crear=True es como crear_archivo: falla si ya existe.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return
+        datos = contenido.encode() if isinstance(contenido, str) else contenido
+        tam = self._tam_bloque(tam_bloque)
+        ruta = self._path(nombre)
+        mv = memoryview(datos)
+        try:
+            with open(ruta, "ab" if anexar else "xb" if crear else "wb") as f:
+                for i in range(0, len(datos), tam):
+                    f.write(mv[i:i + tam])
+                    yield min(i + tam, len(datos))
+            if anexar:
+                self._invalidar(ruta)
+                self._listo(f"Contenido anexado a '{nombre}'.")
+            elif crear:
+                self._anotar(ruta, False, len(datos))
+                self._listo(f"Archivo '{nombre}' creado.")
+            else:
+                self._anotar(ruta, False, len(datos))
+                self._olvidar_indice(nombre)
+                self._listo(f"Archivo '{nombre}' escrito con éxito.")
+        except Exception as e:
+            self._fallo(ERROR, f"Error al escribir '{nombre}':", e)
+
+    def copiar_por_partes(self, origen, destino, sobrescribir=False, tam_bloque=None):
+        """
+        Como copiar_archivo pero en un generador: cada next() copia un solo
+        bloque y entrega (copiados, total). Para repartir una copia grande
+        entre otras tareas con Turnos.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
             return
         src = self._path(origen)
         dst = self._path(destino)
         if self.existe(destino) and not sobrescribir:
-            print(f"Destino '{destino}' ya existe. Usa sobrescribir=True.")
+            self._fallo(YA_EXISTE, f"Destino '{destino}' ya existe. Usa sobrescribir=True.")
             return
         try:
-            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
-                while True:
-                    bloque = fsrc.read(tam_bloque)
-                    if not bloque:
-                        break
-                    fdst.write(bloque)
-            print(f"Copiado '{origen}' -> '{destino}'.")
+            total = os.stat(src)[6]
+            copiados = 0
+            for copiados in self._pasos_copia(src, dst, self._tam_bloque(tam_bloque)):
+                yield copiados, total
+            self._anotar(dst, False, copiados)
+            self._listo(f"Copiado '{origen}' -> '{destino}' ({copiados} bytes).")
         except Exception as e:
-            print(f"Error al copiar '{origen}':", e)
+            self._fallo(ERROR, f"Error al copiar '{origen}':", e)
 
+    @_reintento
     def mover_archivo(self, origen, destino, sobrescribir=False):
-        """Mueve un archivo (copia y borra)."""
-        if self.existe(destino) and not sobrescribir:
-            print(f"Destino '{destino}' ya existe. Usa sobrescribir=True.")
+        """
+        Mueve un archivo o una carpeta. Dentro de la misma tarjeta es un
+        os.rename: no lee ni escribe datos y no ocupa espacio extra.
+        Solo si el rename cruza a otro volumen copia, verifica el tamaño y
+        recién entonces borra el original.
+        Si destino es una carpeta existente, mueve adentro de ella.
+        Con sobrescribir=True el destino viejo se aparta primero y se borra
+        cuando el nuevo ya quedó en su lugar (si algo falla, se restaura).
+        Devuelve True si movió.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
+        if not self.existe(origen):
+            self._fallo(NO_EXISTE, f"Origen '{origen}' no existe.")
+            return False
+        if self.es_directorio(destino):
+            destino = destino.rstrip("/") + "/" + origen.rstrip("/").split("/")[-1]
+        src = self._path(origen)
+        dst = self._path(destino)
+        if src == dst:
+            return True
+        ocupado = self.existe(destino)
+        if ocupado and not sobrescribir:
+            self._fallo(YA_EXISTE, f"Destino '{destino}' ya existe. Usa sobrescribir=True.")
+            return False
+        apartado = None
+        try:
+            if ocupado:
+                apartado = dst + ".old~"
+                os.rename(dst, apartado)
+                self._invalidar(dst)  # _borrar_ruta pregunta por apartado
+            try:
+                os.rename(src, dst)
+            except OSError as e:
+                if _errno(e) != _EXDEV:
+                    raise
+                self._mover_copiando(src, dst)
+            self._invalidar(src, dst)
+            if apartado:
+                self._borrar_ruta(apartado)
+            self._olvidar_indice(origen)
+            self._olvidar_indice(destino)
+            self._listo(f"'{origen}' movido a '{destino}'.")
+            return True
+        except Exception as e:
+            if apartado:
+                try:
+                    os.rename(apartado, dst)
+                except OSError:
+                    pass
+            self._fallo(ERROR, f"Error al mover '{origen}':", e)
+            return False
+        finally:
+            self._invalidar(src, dst)
+
+    def _mover_copiando(self, src, dst):
+        """Mueve entre volúmenes: copia, verifica tamaños y borra el origen."""
+        if (os.stat(src)[0] & 0x4000) != 0:
+            os.mkdir(dst)
+            for nombre in os.listdir(src):
+                self._mover_copiando(src + "/" + nombre, dst + "/" + nombre)
+            os.rmdir(src)
             return
-        self.copiar_archivo(origen, destino, sobrescribir=sobrescribir)
-        if self.existe(destino):
-            self.borrar_archivo(origen)
+        if self.copiar_archivo(src, dst, sobrescribir=True) is None:
+            raise OSError("no se pudo copiar")
+        if os.stat(src)[6] != os.stat(dst)[6]:
+            os.remove(dst)
+            raise OSError("la copia no coincide con el original")
+        os.remove(src)
 
+    def _borrar_ruta(self, ruta):
+        if self.es_directorio(ruta):
+            self.borrar_directorio(ruta, recursivo=True)
+        else:
+            os.remove(self._path(ruta))
+
+    @_reintento
     def borrar_archivo(self, nombre):
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
-            return
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
         try:
             os.remove(self._path(nombre))
-            print(f"Archivo '{nombre}' eliminado.")
+            self._invalidar(self._path(nombre))
+            self._olvidar_indice(nombre)
+            self._listo(f"Archivo '{nombre}' eliminado.")
+            return True
         except Exception as e:
-            print(f"Error al eliminar '{nombre}':", e)
+            self._fallo(ERROR, f"Error al eliminar '{nombre}':", e)
+            return False
 
     # ---------------------- Directorios ----------------------
 
+    @_reintento
     def crear_directorio(self, ruta):
         """Crea un directorio (no recursivo)."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
-            return
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
         try:
             os.mkdir(self._path(ruta))
-            print(f"Directorio '{ruta}' creado.")
+            self._anotar(self._path(ruta), True, 0)
+            self._listo(f"Directorio '{ruta}' creado.")
+            return True
         except Exception as e:
-            print(f"Error al crear directorio '{ruta}':", e)
+            self._fallo(ERROR, f"Error al crear directorio '{ruta}':", e)
+            return False
 
+    @_reintento
     def borrar_directorio(self, ruta, recursivo=False):
         """Elimina directorio. Si recursivo=True, borra su contenido."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
-            return
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return False
         pr = self._path(ruta)
         try:
             if recursivo:
-                # Borrar archivos
-                for item, isdir in list(self.listar_recursivo(ruta)):
-                    if not isdir:
-                        try:
-                            os.remove(self._path(item))
-                        except Exception as e:
-                            print(f"Error al borrar '{item}':", e)
-                # Borrar directorios de abajo hacia arriba
-                dirs = [p for p, isd in self.listar_recursivo(ruta) if isd]
-                for d in sorted(dirs, key=lambda s: len(s), reverse=True):
+                # Una sola pasada en post-orden: cada carpeta llega vacía
+                for item, isdir, _ in self.recorrer(ruta, orden="post"):
                     try:
-                        os.rmdir(self._path(d))
+                        if isdir:
+                            os.rmdir(self._path(item))
+                        else:
+                            os.remove(self._path(item))
                     except Exception as e:
-                        print(f"Error al borrar dir '{d}':", e)
+                        self._fallo(ERROR, f"Error al borrar '{item}':", e)
             os.rmdir(pr)
-            print(f"Directorio '{ruta}' eliminado.")
+            self._listo(f"Directorio '{ruta}' eliminado.")
+            return True
+        except Exception as e:
+            self._fallo(ERROR, f"Error al borrar directorio '{ruta}':", e)
+            return False
+        finally:
+            self._invalidar(pr)
+            abajo = pr.rstrip("/") + "/"
+            for r in [r for r in self._indices if r.startswith(abajo)]:
+                del self._indices[r]
+
+    # ---------------------- Bus SPI ----------------------
+
+    def disponible(self):
+        """
+        True si la tarjeta está montada. Si no lo está, intenta montarla
+        (como mucho una vez cada reintento_s segundos, para no frenar cada
+        llamada cuando no hay tarjeta) y limpia temporales con recuperar().
+        """
+        if self.mounted:
+            return True
+        ahora = time.monotonic()
+        if self._ultimo_intento is not None and ahora - self._ultimo_intento < self.reintento_s:
+            return False
+        self._ultimo_intento = ahora
+        try:
+            self._montar()
         except Exception as e:
-            print(f"Error al borrar directorio '{ruta}':", e)
+            self._desmontar()
+            # NO_MONTADA y no ERROR_IO: _reintento no debe remontar enseguida
+            # (sería otro intento de iniciar la tarjeta en la misma llamada)
+            self._fallo(NO_MONTADA, "Error al inicializar la tarjeta SD:", e)
+            return False
+        self._listo(f"Tarjeta SD montada con éxito en {self.mount_point}")
+        if self._recuperar != 0:
+            self.recuperar("/", self._recuperar)
+        return True
+
+    def salud(self):
+        """
+        Chequeo barato: lee un sector crudo (512 bytes por SPI, sin pasar
+        por el FAT). Si la tarjeta no responde la da por desmontada y el
+        próximo uso la vuelve a montar. Devuelve True si responde.
+        """
+        if not self.mounted:
+            return False
+        if self._sector is None:
+            self._sector = bytearray(512)
+        try:
+            self.sd.readblocks(0, self._sector)
+            return True
+        except Exception as e:
+            self._fallo(ERROR_IO, "La tarjeta SD no responde:", e)
+            self._desmontar()
+            return False
+
+    def remontar(self):
+        """Desmonta y vuelve a montar ya (tarjeta que se sacó y se volvió a poner)."""
+        self._desmontar()
+        self._ultimo_intento = None
+        return self.disponible()
+
+    def _montar(self):
+        """Inicia la tarjeta (con self.baudrate si se pidió) y monta el VFS."""
+        if self.baudrate is None:
+            self.sd = sdcardio.SDCard(self.spi, self.cs)
+        else:
+            self.sd = sdcardio.SDCard(self.spi, self.cs, baudrate=self.baudrate)
+        self.vfs = storage.VfsFat(self.sd)
+        storage.mount(self.vfs, self.mount_point)
+        self.mounted = True
+
+    def _desmontar(self):
+        if self.mounted:
+            try:
+                storage.umount(self.mount_point)
+            except OSError:
+                pass
+        self.mounted = False
+        if self.sd is not None:
+            try:
+                self.sd.deinit()
+            except Exception:
+                pass
+            self.sd = None
+        # todo lo que se recuerda de la tarjeta: al volver puede ser otra
+        self.olvidar_cache()
+        self._indices = {}
+        self._contadores = {}
+        self._slots = {}
+
+    def cambiar_baudrate(self, baudrate):
+        """Reinicia la tarjeta con otro reloj SPI (desmonta y vuelve a montar)."""
+        self._desmontar()
+        self.baudrate = baudrate
+        try:
+            self._montar()
+            self._listo(f"SPI de la SD a {baudrate} Hz.")
+            return True
+        except Exception as e:
+            self._fallo(ERROR, f"La SD no inicia a {baudrate} Hz:", e)
+            return False
+
+    def sondear_baudrate(self, candidatos=(24000000, 16000000, 12000000, 8000000, 4000000),
+                         bloques=16, vueltas=3):
+        """
+        Busca el reloj SPI más rápido que anda bien con esta tarjeta y este
+        cableado. Lee 'bloques' sectores crudos al reloj actual como
+        referencia (solo lectura, no toca el FAT); después, de más rápido a
+        más lento, reinicia la tarjeta en cada candidato, relee esos sectores
+        'vueltas' veces y escribe y relee un archivo de prueba. Se queda con
+        el primero que pasa todo y lo devuelve; si ninguno pasa vuelve al
+        reloj de antes y devuelve None.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return None
+        previo = self.baudrate
+        ref = bytearray(512 * bloques)
+        try:
+            self.sd.readblocks(0, ref)
+        except Exception as e:
+            self._fallo(ERROR, "No se pudo leer la referencia:", e)
+            return None
+        buf = bytearray(len(ref))
+        patron = bytes((i * 7 + 3) & 0xFF for i in range(4096))
+        for baudrate in candidatos:
+            if self.cambiar_baudrate(baudrate) and self._verificar(ref, buf, vueltas, patron):
+                self._listo(f"Reloj SPI elegido: {baudrate} Hz.")
+                return baudrate
+        self.cambiar_baudrate(previo)
+        self._fallo(ERROR, "Ningún reloj SPI pasó la verificación.")
+        return None
+
+    def _verificar(self, ref, buf, vueltas, patron):
+        """Relee los sectores de referencia y hace ida y vuelta de un archivo."""
+        try:
+            for _ in range(vueltas):
+                self.sd.readblocks(0, buf)
+                if buf != ref:
+                    return False
+            ruta = self.mount_point + "/.sonda.tmp~"
+            with open(ruta, "wb") as f:
+                f.write(patron)
+                _sincronizar(f)
+            with open(ruta, "rb") as f:
+                ok = f.read() == patron
+            os.remove(ruta)
+            return ok
+        except Exception:
+            return False
+
+    def medir_velocidad(self, tam=256 * 1024, tam_bloque=None):
+        """
+        Escribe y relee un archivo temporal de 'tam' bytes y devuelve
+        (MB/s escritura, MB/s lectura) sostenidos al reloj actual.
+        """
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
+            return None
+        ruta = self.mount_point + "/.velocidad.tmp~"
+        buf = self._buffer(self._tam_bloque(tam_bloque))
+        vueltas = max(1, tam // len(buf))
+        try:
+            t0 = time.monotonic()
+            with open(ruta, "wb") as f:
+                for _ in range(vueltas):
+                    f.write(buf)
+                _sincronizar(f)
+            t1 = time.monotonic()
+            with open(ruta, "rb") as f:
+                while f.readinto(buf):
+                    pass
+            t2 = time.monotonic()
+            os.remove(ruta)
+        except Exception as e:
+            self._fallo(ERROR, "Error al medir la velocidad:", e)
+            return None
+        mb = vueltas * len(buf) / 1048576
+        return mb / max(t1 - t0, 1e-6), mb / max(t2 - t1, 1e-6)
+
+    def comparar_baudrates(self, candidatos=(4000000, 8000000, 12000000, 16000000, 24000000), tam=256 * 1024):
+        """
+        medir_velocidad() en cada reloj. Devuelve [(baudrate, MB/s escr.,
+        MB/s lect.)] (None en los que la tarjeta no inicia) y deja el reloj
+        con el que estaba.
+        """
+        previo = self.baudrate
+        tabla = []
+        for baudrate in candidatos:
+            vel = self.medir_velocidad(tam) if self.cambiar_baudrate(baudrate) else None
+            tabla.append((baudrate,) + (vel or (None, None)))
+            if vel:
+                self._listo(f"{baudrate:>9} Hz  escritura {vel[0]:.2f} MB/s  lectura {vel[1]:.2f} MB/s")
+        self.cambiar_baudrate(previo)
+        return tabla
 
     # ---------------------- Detalles de la tarjeta ----------------------
 
+    @_reintento
     def detalles_tarjeta(self):
         """Capacidad total, libre y usada en MB, y listado raíz.
            Devuelve claves modernas y alias para compatibilidad."""
-        if not self.mounted:
-            print("La tarjeta SD no está montada.")
+        if not self.disponible():
+            self._fallo(NO_MONTADA, "La tarjeta SD no está montada.")
             return None
         try:
             statvfs = os.statvfs(self.mount_point)
@@ -310,11 +1694,391 @@ class SDManager:
                 "espacio_utilizado": info["espacio_usado_mb"],
                 "archivos": info["raiz"],
             })
-            print("Detalles SD:", info)
+            self._listo(f"Detalles SD: {info}")
             return info
         except Exception as e:
-            print("Error al obtener detalles:", e)
+            self._fallo(ERROR, "Error al obtener detalles:", e)
+            return None
+
+
+_IDX_MAGIC = 0x31584449  # "IDX1"
+
+
+class IndiceLineas:
+    """
+    Offsets de las líneas 1, 1+cada, 1+2*cada, ... en un array('I').
+    Para llegar a la línea N alcanza con un seek y saltar menos de 'cada'
+    líneas. En disco (<archivo>.idx) es el mismo array precedido por una
+    cabecera: magic, cada, lineas, tam, inicio.
+    """
+
+    def __init__(self, cada=64):
+        self.cada = cada
+        self.offsets = array("I", [0])
+        self.lineas = 0   # saltos de línea vistos
+        self.tam = 0      # bytes del archivo ya indexados
+        self.inicio = 0   # dónde empieza la línea en curso
+        self.escritor = None  # el Registro que escribe el archivo, mientras esté abierto
+
+    @property
+    def total(self):
+        """Cantidad de líneas, contando una última sin salto final."""
+        return self.lineas + (1 if self.tam > self.inicio else 0)
+
+    def agregar(self, datos, n=None):
+        """Cuenta los bytes datos[:n] agregados al final del archivo."""
+        if n is None:
+            n = len(datos)
+        i = 0
+        while True:
+            j = datos.find(b"\n", i, n)
+            if j < 0:
+                break
+            self.lineas += 1
+            self.inicio = self.tam + j + 1
+            if self.lineas % self.cada == 0:
+                self.offsets.append(self.inicio)
+            i = j + 1
+        self.tam += n
+
+    def actualizar(self, ruta, tam=512):
+        """Lee lo que falta indexar. Devuelve True si algo cambió."""
+        try:
+            largo = os.stat(ruta)[6]
+        except OSError:
+            largo = 0  # todavía no existe (p. ej. un registro nuevo)
+        if largo == self.tam:
+            return False
+        if largo < self.tam:
+            self.__init__(self.cada)
+        with open(ruta, "rb") as f:
+            f.seek(self.tam)
+            while True:
+                bloque = f.read(tam)
+                if not bloque:
+                    break
+                self.agregar(bloque)
+        return True
+
+    def ubicar(self, numero):
+        """(offset, número) de la línea indexada más cercana <= numero."""
+        k = min((numero - 1) // self.cada, len(self.offsets) - 1)
+        return self.offsets[k], k * self.cada + 1
+
+    def guardar(self, ruta_idx):
+        with open(ruta_idx, "wb") as f:
+            f.write(array("I", [_IDX_MAGIC, self.cada, self.lineas, self.tam, self.inicio]))
+            f.write(self.offsets)
+
+    @classmethod
+    def cargar(cls, ruta_idx):
+        """Lee un .idx; None si no existe o no es válido."""
+        try:
+            n = os.stat(ruta_idx)[6] // 4
+            if n < 6:
+                return None
+            datos = array("I", range(n))  # solo reserva; readinto lo pisa
+            with open(ruta_idx, "rb") as f:
+                f.readinto(datos)
+        except OSError:
             return None
+        if datos[0] != _IDX_MAGIC:
+            return None
+        idx = cls(datos[1])
+        idx.lineas, idx.tam, idx.inicio = datos[2], datos[3], datos[4]
+        idx.offsets = datos[5:]
+        return idx
+
+
+class Turnos:
+    """
+    Planificador mínimo para compartir el tiempo (y el bus) entre tareas.
+    Cada tarea es un generador que hace una porción acotada de trabajo por
+    next(): un bloque de SD (copiar_por_partes, iterar_bloques, ...) o un
+    refresco de pantalla. correr() las alterna en ronda, así una copia
+    grande nunca deja la pantalla esperando más que un bloque.
+    """
+
+    def __init__(self):
+        self.tareas = []
+
+    def agregar(self, tarea):
+        self.tareas.append(tarea)
+        return tarea
+
+    def paso(self):
+        """Un turno para cada tarea; saca las terminadas. Devuelve cuántas quedan."""
+        for tarea in list(self.tareas):
+            try:
+                next(tarea)
+            except StopIteration:
+                self.tareas.remove(tarea)
+        return len(self.tareas)
+
+    def correr(self, segundos=None):
+        """Alterna hasta que no quedan tareas o pasan 'segundos'."""
+        t0 = time.monotonic()
+        while self.tareas and (segundos is None or time.monotonic() - t0 < segundos):
+            self.paso()
+
+
+class SDAsincrono:
+    """
+    Frente asyncio para SDManager (necesita la biblioteca asyncio). Cada
+    operación usa los generadores por partes de SDManager y cede el control
+    después de cada bloque, así el muestreo de sensores, la pantalla y la SD
+    comparten el núcleo y ninguna tarea espera más que un bloque.
+    Montar la tarjeta sigue siendo un solo paso (sdcardio no se puede partir).
+    """
+
+    def __init__(self, sd):
+        if asyncio is None:
+            raise ImportError("SDAsincrono necesita la biblioteca asyncio")
+        self.sd = sd
+
+    async def correr(self, pasos):
+        """Consume un generador de SDManager cediendo entre pasos; devuelve el último valor."""
+        ultimo = None
+        for ultimo in pasos:
+            await asyncio.sleep(0)
+        return ultimo
+
+    async def montar(self):
+        await asyncio.sleep(0)
+        return self.sd.disponible()
+
+    async def crear(self, nombre, contenido, tam_bloque=None):
+        """Como crear_archivo: no pisa un archivo que ya existe."""
+        await self.correr(self.sd.escribir_por_partes(nombre, contenido, False, tam_bloque, crear=True))
+        return self.sd.estado[0] == OK
+
+    async def escribir(self, nombre, contenido, tam_bloque=None):
+        await self.correr(self.sd.escribir_por_partes(nombre, contenido, False, tam_bloque))
+        return self.sd.estado[0] == OK
+
+    async def anexar(self, nombre, contenido, tam_bloque=None):
+        await self.correr(self.sd.escribir_por_partes(nombre, contenido, True, tam_bloque))
+        return self.sd.estado[0] == OK
+
+    async def copiar(self, origen, destino, sobrescribir=False, tam_bloque=None):
+        await self.correr(self.sd.copiar_por_partes(origen, destino, sobrescribir, tam_bloque))
+        return self.sd.estado[0] == OK
+
+    async def procesar_bloques(self, nombre, funcion, tam=512, desde=0):
+        """Llama funcion(bloque) por cada bloque del archivo, cediendo entre bloques."""
+        for bloque in self.sd.iterar_bloques(nombre, tam, desde):
+            funcion(bloque)
+            await asyncio.sleep(0)
+
+    async def procesar_lineas(self, nombre, funcion, desde=0, cada=16):
+        """Llama funcion(linea) por cada línea; cede cada 'cada' líneas."""
+        n = 0
+        for linea in self.sd.iterar_lineas(nombre, desde):
+            funcion(linea)
+            n += 1
+            if n % cada == 0:
+                await asyncio.sleep(0)
+
+    async def vaciar_cada(self, registro, segundos=5.0):
+        """Tarea que baja un Registro a la SD cada tantos segundos, hasta que se cierra."""
+        while registro._f is not None:
+            await asyncio.sleep(segundos)
+            registro.flush()
+
+
+class Registro:
+    """
+    Logger para anexar muchas líneas seguidas sin abrir/cerrar el archivo en
+    cada una. Junta los registros en un bytearray preasignado y lo baja a la
+    SD cuando se llena, cuando pasan intervalo_s segundos desde la última
+    bajada, o a pedido con flush(). close() (o salir del 'with') baja lo que
+    quede y cierra el archivo.
+    """
+
+    def __init__(self, sd, nombre, tam_buffer=2048, intervalo_s=5.0, indice=None):
+        self.nombre = nombre
+        self._sd = sd
+        self._idx = indice
+        self.intervalo_s = intervalo_s
+        self._buf = bytearray(tam_buffer)
+        self._mv = memoryview(self._buf)
+        self._n = 0
+        self.registros = 0
+        self.flushes = 0
+        ruta = sd._path(nombre)
+        self._f = open(ruta, "ab")
+        # si el archivo es nuevo, que la caché del directorio ya lo vea; el
+        # tamaño se vuelve a leer en cada flush
+        sd._anotar(ruta, False, self._f.tell())
+        self._ultimo_flush = time.monotonic()
+        if indice is not None:
+            indice.escritor = self
+
+    def escribir(self, texto):
+        """Agrega texto (str o bytes) tal cual, sin salto de línea."""
+        if self._f is None:
+            raise ValueError("registro cerrado")
+        data = texto.encode() if isinstance(texto, str) else texto
+        n = len(data)
+        if self._n + n > len(self._buf):
+            self._bajar()
+        if n > len(self._buf):
+            self._f.write(data)  # no entra en el buffer: directo
+            if self._idx is not None:
+                self._idx.agregar(data)
+        else:
+            self._mv[self._n:self._n + n] = data
+            self._n += n
+        self._contar()
+
+    def _contar(self):
+        self.registros += 1
+        if self.intervalo_s is not None and time.monotonic() - self._ultimo_flush >= self.intervalo_s:
+            self.flush()
+
+    def linea(self, *valores, sep=","):
+        """Agrega una línea con los valores separados por sep."""
+        self.escribir(sep.join([str(v) for v in valores]) + "\n")
+
+    def _bajar(self):
+        if self._n:
+            self._f.write(self._mv[:self._n])
+            if self._idx is not None:
+                self._idx.agregar(self._buf, self._n)
+            self._n = 0
+
+    def flush(self):
+        """Baja el buffer a la SD y sincroniza el archivo."""
+        if self._f is None:
+            return
+        self._bajar()
+        self._f.flush()
+        self._sd._invalidar(self._sd._path(self.nombre))
+        self.flushes += 1
+        self._ultimo_flush = time.monotonic()
+
+    def close(self):
+        if self._f is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._f.close()
+            self._f = None
+            if self._idx is not None:
+                self._idx.escritor = None
+                try:
+                    self._idx.guardar(self._sd._path(self.nombre) + ".idx")
+                    self._sd._invalidar(self._sd._path(self.nombre))
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class RegistroBinario(Registro):
+    """
+    Registro de filas de ancho fijo empaquetadas con struct: no formatea
+    números como texto, así que ocupa y tarda bastante menos que linea().
+    El archivo empieza con una cabecera (b"SDR1" y "formato|campos|delta")
+    y después va una fila de struct.calcsize(formato) bytes por muestra.
+
+    Con delta_t el primer campo es un tiempo entero (p. ej. ms de
+    time.monotonic_ns() // 1000000) y se guarda la diferencia con la fila
+    anterior en el tipo sin signo del formato ("H" alcanza para 65 s entre
+    muestras). Si no entra, va para atrás o es la primera fila desde que se
+    abrió, el delta queda en su máximo y detrás van 8 bytes con el tiempo
+    absoluto. Al reabrir un archivo cuya última fila quedó cortada (corte
+    de luz) se la descarta antes de seguir, así no se desalinea el resto.
+    """
+
+    def __init__(self, sd, nombre, campos, formato, delta_t=False, tam_buffer=2048, intervalo_s=5.0):
+        if isinstance(campos, str):
+            campos = campos.split(",")
+        if formato[0] not in "<>!=@":
+            formato = "<" + formato
+        self.campos = list(campos)
+        self.formato = formato
+        self.delta_t = bool(delta_t)
+        self.tam_fila = struct.calcsize(formato)
+        if len(struct.unpack(formato, bytes(self.tam_fila))) != len(self.campos):
+            raise ValueError("los campos no coinciden con el formato")
+        if self.tam_fila + 8 > tam_buffer:
+            raise ValueError("tam_buffer demasiado chico para una fila")
+        if self.delta_t:
+            if formato[1] not in _BIN_DELTAS:
+                raise ValueError("con delta_t el primer campo va sin signo (B, H, I, L o Q)")
+            self._max = (1 << (8 * struct.calcsize(formato[:2]))) - 1
+        self._ultimo_t = None
+        ruta = sd._path(nombre)
+        try:
+            tam = os.stat(ruta)[6]
+        except OSError:
+            tam = 0
+        if tam:
+            with open(ruta, "rb") as f:
+                if _cabecera_binaria(f) != (self.formato, self.campos, self.delta_t):
+                    raise ValueError("el archivo tiene otro formato")
+                # recorrer una vez para encontrar el final de la última fila
+                # entera: anexar detrás de una fila cortada desalinea todo
+                fin = [0]
+                inicio = f.tell()
+                for _ in _filas_binario(f, self.formato, self.delta_t, fin=fin):
+                    pass
+                fin = inicio + fin[0]
+            if fin < tam:
+                self._recortar(sd, ruta, fin)
+        Registro.__init__(self, sd, nombre, tam_buffer, intervalo_s)
+        if not tam:
+            delta = "1" if self.delta_t else "0"
+            self.escribir(_BIN_MAGIC + f"{formato}|{','.join(self.campos)}|{delta}\n".encode())
+            self.registros = 0
+
+    def _recortar(self, sd, ruta, fin):
+        """
+        Deja el archivo en sus primeros fin bytes. Con truncate si el
+        sistema lo tiene; si no, copia esa parte a un temporal y lo pone en
+        lugar del original.
+        """
+        with open(ruta, "r+b") as f:
+            if hasattr(f, "truncate"):
+                f.truncate(fin)
+                sd._invalidar(ruta)
+                return
+        tmp = ruta + ".tmp~"
+        with open(ruta, "rb") as fi, open(tmp, "wb") as fo:
+            sd._copiar_rango(fi, fo, fin, sd._tam_bloque(None))
+        sd._reemplazar_con(tmp, ruta)
+
+    def fila(self, *valores):
+        """Agrega una muestra: un valor por campo, en el orden del formato."""
+        if self._f is None:
+            raise ValueError("registro cerrado")
+        extra = 0
+        if self.delta_t:
+            t = valores[0]
+            d = -1 if self._ultimo_t is None else t - self._ultimo_t
+            if not 0 <= d < self._max:
+                d = self._max
+                extra = 8
+            valores = (d,) + valores[1:]
+        if self._n + self.tam_fila + extra > len(self._buf):
+            self._bajar()
+        n = self._n
+        struct.pack_into(self.formato, self._buf, n, *valores)
+        n += self.tam_fila
+        if extra:
+            struct.pack_into("<q", self._buf, n, t)
+            n += 8
+        self._n = n
+        if self.delta_t:
+            self._ultimo_t = t
+        self._contar()
 
 
 # ---------------------- Ejemplo de uso en REPL ----------------------
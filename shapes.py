@@ -1,12 +1,18 @@
 # shapes.py
 # Mini-librería de figuras para displayio (CircuitPython) sin adafruit_display_shapes.
-# Devuelve TileGrids listos para agregar a tu Group.
+# Devuelve TileGrids listos para agregar a tu Group, o dibuja todo en un Canvas.
 
 import displayio
 
+try:
+    import bitmaptools
+except ImportError:
+    # Sin bitmaptools se rellena fila a fila desde Python.
+    bitmaptools = None
+
 # ---------- Utils de paleta y bitmap ----------
 
-def _make_palette(fill=None, outline=None, transparent_bg=True):
+def _build_palette(fill=None, outline=None, transparent_bg=True):
     """
     Crea una Palette adecuada según fill/outline.
     Index 0 = fondo (puede ser transparente),
@@ -49,65 +55,703 @@ def _make_palette(fill=None, outline=None, transparent_bg=True):
     return pal, idx_fill, idx_outline
 
 
+class PaletteCache:
+    """
+    Caché acotada de paletas internadas por (fill, outline, transparent_bg).
+    Todas las figuras del mismo color comparten la misma Palette, así que
+    recolor() cambia de una vez todas las que la usan. Al llenarse descarta
+    la menos usada recientemente (las figuras que ya la tienen la conservan).
+    max_size=0 desactiva la caché.
+    """
+
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self._entries = {}
+        self._orden = []  # claves, de la menos a la más usada
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, fill=None, outline=None, transparent_bg=True):
+        """Devuelve (palette, idx_fill, idx_outline), reutilizando si se puede."""
+        key = (fill, outline, bool(transparent_bg))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            if self._orden[-1] != key:
+                self._orden.remove(key)
+                self._orden.append(key)
+            return entry
+        self.misses += 1
+        entry = _build_palette(fill, outline, transparent_bg)
+        if self.max_size > 0:
+            self._store(key, entry)
+        return entry
+
+    def _store(self, key, entry):
+        while len(self._orden) >= self.max_size:
+            viejo = self._orden.pop(0)
+            del self._entries[viejo]
+            self.evictions += 1
+        self._entries[key] = entry
+        self._orden.append(key)
+
+    def recolor(self, fill=None, outline=None, transparent_bg=True, new_fill=None, new_outline=None):
+        """
+        Cambia los colores de la paleta compartida (fill, outline, transparent_bg)
+        sin reconstruir TileGrids. new_fill/new_outline en None = no cambiar.
+        Devuelve False si esa paleta no está en la caché.
+        """
+        key = (fill, outline, bool(transparent_bg))
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        pal, idx_fill, idx_outline = entry
+        if new_fill is not None and idx_fill is not None:
+            pal[idx_fill] = new_fill
+            fill = new_fill
+        if new_outline is not None and idx_outline is not None:
+            pal[idx_outline] = new_outline
+            outline = new_outline
+        nueva = (fill, outline, bool(transparent_bg))
+        if nueva != key:
+            del self._entries[key]
+            self._orden.remove(key)
+            if nueva in self._entries:
+                del self._entries[nueva]
+                self._orden.remove(nueva)
+            self._store(nueva, entry)
+        return True
+
+    def clear(self):
+        """Vacía la caché (las figuras existentes conservan su paleta)."""
+        self._entries = {}
+        self._orden = []
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._orden),
+            "max_size": self.max_size,
+        }
+
+
+palettes = PaletteCache()
+
+
+def _make_palette(fill=None, outline=None, transparent_bg=True):
+    """Paleta (compartida) para fill/outline; ver PaletteCache."""
+    return palettes.get(fill, outline, transparent_bg)
+
+
 def _new_bitmap(w, h, colors):
     if w <= 0: w = 1
     if h <= 0: h = 1
     return displayio.Bitmap(w, h, colors)
 
 
+def _bitmap_bytes(w, h, colors):
+    """Bytes aproximados de un Bitmap: filas alineadas a 32 bits."""
+    bits = 1
+    while (1 << bits) < colors:
+        bits *= 2
+    return ((max(1, w) * bits + 31) // 32) * 4 * max(1, h)
+
+
+class BitmapCache:
+    """
+    Caché de bitmaps ya rasterizados, para figuras repetidas (puntos de
+    estado, botones, viñetas). La clave es la geometría: (tipo, tamaños,
+    stroke, hay_fill, hay_outline); el color va en la paleta, así que dos
+    círculos iguales de distinto color comparten el Bitmap y solo cuestan
+    un TileGrid cada uno.
+    max_bytes es el presupuesto de RAM; al pasarse descarta lo menos usado
+    recientemente (los TileGrids que ya lo usan lo conservan).
+    Los bitmaps son compartidos: no hay que pintar encima de ellos.
+    """
+
+    def __init__(self, max_bytes=16384):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = {}
+        self._orden = []  # claves, de la menos a la más usada
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, w, h, colors, draw, *args):
+        """Bitmap para key; si no está, lo crea de w×h y llama draw(bmp, *args)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            if self._orden[-1] != key:
+                self._orden.remove(key)
+                self._orden.append(key)
+            return entry[0]
+        self.misses += 1
+        bmp = _new_bitmap(w, h, colors)
+        draw(bmp, *args)
+        size = _bitmap_bytes(w, h, colors)
+        if size <= self.max_bytes:
+            while self.bytes + size > self.max_bytes:
+                viejo = self._orden.pop(0)
+                self.bytes -= self._entries.pop(viejo)[1]
+                self.evictions += 1
+            self._entries[key] = (bmp, size)
+            self._orden.append(key)
+            self.bytes += size
+        return bmp
+
+    def clear(self):
+        self._entries = {}
+        self._orden = []
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._orden),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+sprites = BitmapCache()
+
+
+def _key_stroke(stroke, idx_outline):
+    """El stroke solo cambia el bitmap si hay borde."""
+    return stroke if idx_outline is not None and stroke > 0 else 0
+
+
+def _shape_bitmap(cache, key, w, h, colors, draw, *args):
+    """Bitmap de la figura: compartido vía sprites si cache=True, nuevo si no."""
+    if cache:
+        return sprites.get(key, w, h, colors, draw, *args)
+    bmp = _new_bitmap(w, h, colors)
+    draw(bmp, *args)
+    return bmp
+
+
 def _pset(bmp, x, y, color_index):
     if 0 <= x < bmp.width and 0 <= y < bmp.height:
         bmp[x, y] = color_index
 
 
+# ---------- Bloques sólidos (bitmap 1×1 escalado) ----------
+
+_solid_bitmaps = {}
+
+
+def _solid_bitmap(color_index, colors):
+    """Bitmap 1×1 compartido cuyo único píxel vale color_index."""
+    key = (color_index, colors)
+    bmp = _solid_bitmaps.get(key)
+    if bmp is None:
+        bmp = displayio.Bitmap(1, 1, colors)
+        bmp[0, 0] = color_index
+        _solid_bitmaps[key] = bmp
+    return bmp
+
+
+def _solid_block(x, y, w, h, pal, color_index):
+    """
+    Bloque w×h de un color hecho con el bitmap 1×1 compartido.
+    El lado corto es la escala del Group y el largo se cubre con tiles de ese
+    tamaño; si no entra justo, un tile más (en su propio Group) se solapa con
+    el anterior para no pasarse del borde.
+    """
+    g = displayio.Group(x=x, y=y)
+    if w <= 0 or h <= 0:
+        return g
+    bmp = _solid_bitmap(color_index, len(pal))
+    side = min(w, h)
+    if w >= h:
+        n = w // side
+        tw, th, rx, ry = n, 1, w - side, 0
+        resto = w - n * side
+    else:
+        n = h // side
+        tw, th, rx, ry = 1, n, 0, h - side
+        resto = h - n * side
+    sub = displayio.Group(scale=side)
+    sub.append(displayio.TileGrid(bmp, pixel_shader=pal, width=tw, height=th,
+                                  tile_width=1, tile_height=1))
+    g.append(sub)
+    if resto:
+        sub = displayio.Group(scale=side, x=rx, y=ry)
+        sub.append(displayio.TileGrid(bmp, pixel_shader=pal))
+        g.append(sub)
+    return g
+
+
+# ---------- Motor de relleno por spans ----------
+
+def _fill_rect(bmp, x, y, w, h, color_index):
+    """
+    Pinta el bloque [x, x+w) × [y, y+h) recortado al bitmap.
+    Usa Bitmap.fill si cubre todo el bitmap, bitmaptools.fill_region si existe,
+    y si no, un bucle por filas.
+    """
+    x0 = x if x > 0 else 0
+    y0 = y if y > 0 else 0
+    x1 = x + w if x + w < bmp.width else bmp.width
+    y1 = y + h if y + h < bmp.height else bmp.height
+    if x0 >= x1 or y0 >= y1:
+        return
+    if x0 == 0 and y0 == 0 and x1 == bmp.width and y1 == bmp.height:
+        bmp.fill(color_index)
+        return
+    if bitmaptools is not None:
+        bitmaptools.fill_region(bmp, x0, y0, x1, y1, color_index)
+        return
+    for yy in range(y0, y1):
+        for xx in range(x0, x1):
+            bmp[xx, yy] = color_index
+
+
+def _hspan(bmp, xa, xb, y, color_index):
+    """Span horizontal [xa, xb] (inclusivo) en la fila y."""
+    if xa <= xb:
+        _fill_rect(bmp, xa, y, xb - xa + 1, 1, color_index)
+
+
+def _circle_spans(r):
+    """
+    Midpoint de círculo que solo guarda, para cada fila dy = 0..r,
+    la media anchura máxima del contorno. Todo en enteros.
+    """
+    half = [0] * (r + 1)
+    x = r
+    y = 0
+    err = 1 - r
+    while x >= y:
+        if x > half[y]:
+            half[y] = x
+        if y > half[x]:
+            half[x] = y
+        y += 1
+        if err < 0:
+            err += 2 * y + 1
+        else:
+            x -= 1
+            err += 2 * (y - x + 1)
+    return half
+
+
+def _ellipse_spans(rx, ry):
+    """
+    Midpoint de elipse (solo enteros, variables de decisión escaladas ×4).
+    Devuelve la media anchura del contorno para cada fila dy = 0..ry; el
+    trabajo es proporcional al perímetro, no al área.
+    """
+    if ry <= 0:
+        return [max(0, rx)]
+    half = [0] * (ry + 1)
+    if rx <= 0:
+        return half
+    a2 = rx * rx
+    b2 = ry * ry
+    x = 0
+    y = ry
+    # Región 1: pendiente suave, avanza en x
+    d = 4 * b2 - 4 * a2 * ry + a2
+    while b2 * x < a2 * y:
+        half[y] = x
+        x += 1
+        if d < 0:
+            d += 8 * b2 * x + 4 * b2
+        else:
+            y -= 1
+            d += 8 * b2 * x - 8 * a2 * y + 4 * b2
+    # Región 2: pendiente fuerte, avanza en y
+    d = b2 * (2 * x + 1) * (2 * x + 1) + 4 * a2 * (y - 1) * (y - 1) - 4 * a2 * b2
+    while y >= 0:
+        if x > half[y]:
+            half[y] = x
+        y -= 1
+        if d > 0:
+            d += 4 * a2 - 8 * a2 * y
+        else:
+            x += 1
+            d += 8 * b2 * x - 8 * a2 * y + 4 * a2
+    # En elipses muy chatas la región 1 baja a y = 0 antes de llegar a rx y
+    # la región 2 avanza a lo sumo un x por fila: la punta queda corta.
+    # (rx, 0) está sobre la elipse, así que la fila del centro llega a rx.
+    half[0] = rx
+    return half
+
+
+def _sym_rows(half, cx, cy, h):
+    """
+    Extremos (izq, der) por fila de una figura simétrica centrada en (cx, cy)
+    a partir de sus medias anchuras. Listas de largo h; filas vacías izq > der.
+    """
+    left = [1] * h
+    right = [0] * h
+    for dy in range(len(half)):
+        for yy in (cy - dy, cy + dy):
+            if 0 <= yy < h:
+                left[yy] = cx - half[dy]
+                right[yy] = cx + half[dy]
+    return left, right
+
+
+def _rrect_rows(x, y, w, h, r):
+    """
+    Extremos (izq, der) por fila de un rectángulo redondeado w×h con esquina r,
+    desplazado a (x, y). Devuelve dos listas de largo y + h; las filas fuera
+    de la figura quedan vacías (izq > der).
+    """
+    left = [1] * (y + h)
+    right = [0] * (y + h)
+    if w <= 0 or h <= 0:
+        return left, right
+    half = _circle_spans(r)
+    for yy in range(h):
+        if yy < r:
+            ins = r - half[r - yy]
+        elif yy > h - r - 1:
+            ins = r - half[yy - (h - r - 1)]
+        else:
+            ins = 0
+        left[y + yy] = x + ins
+        right[y + yy] = x + w - 1 - ins
+    return left, right
+
+
+def _interior_rows(rows):
+    """
+    Filas de la figura sin su borde de 1 px: quedan los píxeles cuyos cuatro
+    vecinos también son de la figura. Con esto, un borde de stroke 1 es el
+    mismo anillo fino (8-conexo) que dibuja el midpoint.
+    """
+    ol, orr = rows
+    h = len(ol)
+    left = [1] * h
+    right = [0] * h
+    for y in range(1, h - 1):
+        left[y] = max(ol[y] + 1, ol[y - 1], ol[y + 1])
+        right[y] = min(orr[y] - 1, orr[y - 1], orr[y + 1])
+    return left, right
+
+
+def _row_segments(outer, inner, y, idx_fill, idx_outline):
+    """Tramos (xa, xb, índice) de la fila y; ver _paint_rows."""
+    a = outer[0][y]
+    b = outer[1][y]
+    if a > b:
+        return ()
+    if idx_outline is None:
+        return ((a, b, idx_fill),)
+    if inner is None or y >= len(inner[0]) or inner[0][y] > inner[1][y]:
+        return ((a, b, idx_outline),)
+    c = inner[0][y]
+    d = inner[1][y]
+    if idx_fill is None:
+        return ((a, c - 1, idx_outline), (d + 1, b, idx_outline))
+    return ((a, c - 1, idx_outline), (c, d, idx_fill), (d + 1, b, idx_outline))
+
+
+def _paint_rows(bmp, outer, inner, idx_fill, idx_outline, ox=0, oy=0):
+    """
+    Pinta una figura descrita por filas sin pisar ningún píxel dos veces.
+    outer = (izq, der) por fila de la silueta; inner = (izq, der) por fila del
+    hueco interior, contenido en outer (None si todo es borde). Lo que queda
+    entre ambos es borde. Para un borde de grosor s el hueco es el interior
+    (_interior_rows) de la misma figura metida s - 1 píxeles.
+    Las filas consecutivas iguales se pintan juntas como un solo bloque.
+    (ox, oy) desplaza la figura dentro del bitmap; lo que sale se recorta.
+    """
+    h = len(outer[0])
+    prev = ()
+    start = 0
+    for y in range(h + 1):
+        segs = _row_segments(outer, inner, y, idx_fill, idx_outline) if y < h else ()
+        if segs != prev:
+            for xa, xb, idx in prev:
+                _fill_rect(bmp, ox + xa, oy + start, xb - xa + 1, y - start, idx)
+            prev = segs
+            start = y
+
+
+def _line_runs(x0, y0, x1, y1, runs, thickness=1):
+    """
+    Bresenham que agrega a runs[y] los tramos horizontales (xa, xb) de la línea.
+    Con thickness > 1 cada tramo se ensancha como si se arrastrara un pincel
+    cuadrado de thickness×thickness: se agrega a las filas que cubre, ya
+    estirado, en vez de pintar el cuadrado en cada paso.
+    """
+    r = thickness // 2
+    extra = thickness - 1 - r
+    alto = len(runs)
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+    x, y = x0, y0
+    ini = x
+    while True:
+        fin = x == x1 and y == y1
+        e2 = 2 * err
+        paso_y = not fin and e2 <= dx
+        if fin or paso_y:
+            a, b = (ini, x) if ini <= x else (x, ini)
+            for yy in range(max(0, y - r), min(alto, y + extra + 1)):
+                runs[yy].append((a - r, b + extra))
+        if fin:
+            break
+        if e2 >= dy:
+            err += dy
+            x += sx
+        if paso_y:
+            err += dx
+            y += sy
+            ini = x
+
+
+def _merge_runs(runs):
+    """Ordena y une tramos que se tocan o se pisan."""
+    runs.sort()
+    out = []
+    for a, b in runs:
+        if out and a <= out[-1][1] + 1:
+            if b > out[-1][1]:
+                out[-1] = (out[-1][0], b)
+        else:
+            out.append((a, b))
+    return out
+
+
+# ---------- Dibujo sobre un bitmap existente ----------
+# Cada figura se dibuja con un _draw_* que recibe el bitmap destino y la
+# posición dentro de él. Las funciones públicas crean un bitmap a medida y
+# las usa también Canvas para dibujar todas en un mismo bitmap.
+
+def _rect_blocks(w, h, stroke, idx_fill, idx_outline):
+    """
+    Bloques (x, y, w, h, índice) que forman un rectángulo sin solaparse:
+    borde en 4 bandas y relleno solo en el interior.
+    """
+    if w <= 0 or h <= 0:
+        return []
+    if idx_outline is None or stroke <= 0:
+        return [(0, 0, w, h, idx_fill)] if idx_fill is not None else []
+    s = stroke
+    yb = max(s, h - s)
+    xr = max(s, w - s)
+    blocks = [
+        (0, 0, w, min(s, h), idx_outline),     # top
+        (0, yb, w, h - yb, idx_outline),       # bottom
+        (0, s, min(s, w), yb - s, idx_outline),  # left
+        (xr, s, w - xr, yb - s, idx_outline),  # right
+    ]
+    if idx_fill is not None:
+        blocks.append((s, s, xr - s, yb - s, idx_fill))
+    return [b for b in blocks if b[2] > 0 and b[3] > 0]
+
+
+def _draw_rect(bmp, x, y, w, h, idx_fill, idx_outline, stroke):
+    for bx, by, bw, bh, idx in _rect_blocks(w, h, stroke, idx_fill, idx_outline):
+        _fill_rect(bmp, x + bx, y + by, bw, bh, idx)
+
+
+def _draw_circle(bmp, x, y, r, idx_fill, idx_outline, stroke):
+    """Círculo de radio r con su bounding box en (x, y)."""
+    if stroke <= 0:
+        idx_outline = None
+    if idx_fill is None and idx_outline is None:
+        return
+    d = r * 2 + 1
+    # El midpoint anota el ancho de cada fila al pasar; el relleno es un span
+    # por fila y el borde grueso es el anillo entre r y r - stroke.
+    outer = _sym_rows(_circle_spans(r), r, r, d)
+    inner = None
+    if idx_outline is not None and r >= stroke:
+        inner = _interior_rows(_sym_rows(_circle_spans(r - stroke + 1), r, r, d))
+    _paint_rows(bmp, outer, inner, idx_fill, idx_outline, x, y)
+
+
+def _draw_ellipse(bmp, x, y, rx, ry, idx_fill, idx_outline, stroke):
+    """Elipse de radios rx, ry con su bounding box en (x, y)."""
+    if stroke <= 0:
+        idx_outline = None
+    if idx_fill is None and idx_outline is None:
+        return
+    h = ry * 2 + 1
+    outer = _sym_rows(_ellipse_spans(rx, ry), rx, ry, h)
+    inner = None
+    if idx_outline is not None and rx >= stroke and ry >= stroke:
+        inner = _interior_rows(_sym_rows(_ellipse_spans(rx - stroke + 1, ry - stroke + 1), rx, ry, h))
+    _paint_rows(bmp, outer, inner, idx_fill, idx_outline, x, y)
+
+
+def _draw_rounded_rect(bmp, x, y, w, h, r, idx_fill, idx_outline, stroke):
+    if r < 1:
+        _draw_rect(bmp, x, y, w, h, idx_fill, idx_outline, stroke)
+        return
+    if stroke <= 0:
+        idx_outline = None
+    if idx_fill is None and idx_outline is None:
+        return
+    r = min(r, w // 2, h // 2)
+    # Silueta por filas; con borde, el hueco sale de otro rect redondeado
+    # metido stroke - 1 píxeles, con esquinas concéntricas.
+    outer = _rrect_rows(0, 0, w, h, r)
+    inner = None
+    if idx_outline is not None:
+        s = stroke - 1
+        inner = _interior_rows(_rrect_rows(s, s, w - 2 * s, h - 2 * s, max(0, r - s)))
+    _paint_rows(bmp, outer, inner, idx_fill, idx_outline, x, y)
+
+
+def _draw_triangle(bmp, x0, y0, x1, y1, x2, y2, idx_fill, idx_outline):
+    """
+    Triángulo en coordenadas del bitmap. Se rasteriza en coords locales a su
+    bounding box y se pinta desplazado. El outline (Bresenham) va por tramos
+    de fila y el relleno ocupa solo lo que queda entre ellos.
+    """
+    minx = min(x0, x1, x2)
+    miny = min(y0, y1, y2)
+    h = max(y0, y1, y2) - miny + 1
+    x0 -= minx; y0 -= miny
+    x1 -= minx; y1 -= miny
+    x2 -= minx; y2 -= miny
+
+    rows = None
+    if idx_fill is not None:
+        rows = _triangle_rows(x0, y0, x1, y1, x2, y2, h)
+
+    if idx_outline is None:
+        if rows is not None:
+            _paint_rows(bmp, rows, None, idx_fill, None, minx, miny)
+        return
+
+    runs = [[] for _ in range(h)]
+    _line_runs(x0, y0, x1, y1, runs)
+    _line_runs(x1, y1, x2, y2, runs)
+    _line_runs(x2, y2, x0, y0, runs)
+    for y in range(h):
+        tramos = _merge_runs(runs[y])
+        yy = miny + y
+        if rows is not None and rows[0][y] <= rows[1][y]:
+            # relleno = span de la fila menos los tramos de borde
+            x = rows[0][y]
+            fin = rows[1][y]
+            for a, b in tramos:
+                if a > x:
+                    _hspan(bmp, minx + x, minx + min(a - 1, fin), yy, idx_fill)
+                if b + 1 > x:
+                    x = b + 1
+            _hspan(bmp, minx + x, minx + fin, yy, idx_fill)
+        for a, b in tramos:
+            _hspan(bmp, minx + a, minx + b, yy, idx_outline)
+
+
+def _draw_lines(bmp, ox, oy, segments, thickness, idx):
+    """
+    Segmentos (x0, y0, x1, y1) sobre un bitmap cuyo píxel (0, 0) es el punto
+    (ox, oy). Lo que cae fuera del bitmap se recorta; los segmentos que caen
+    enteros fuera ni se recorren.
+    """
+    t = max(1, thickness)
+    r = t // 2
+    extra = t - 1 - r
+    w = bmp.width
+    h = bmp.height
+    runs = [[] for _ in range(h)]
+    for x0, y0, x1, y1 in segments:
+        x0 -= ox; x1 -= ox
+        y0 -= oy; y1 -= oy
+        if max(x0, x1) + extra < 0 or min(x0, x1) - r >= w:
+            continue
+        if max(y0, y1) + extra < 0 or min(y0, y1) - r >= h:
+            continue
+        _line_runs(x0, y0, x1, y1, runs, t)
+    for y in range(h):
+        if runs[y]:
+            for a, b in _merge_runs(runs[y]):
+                _hspan(bmp, a, b, y, idx)
+
+
+def _lines_bbox(segments, thickness):
+    """(minx, miny, maxx, maxy) de los segmentos con el pincel incluido."""
+    t = max(1, thickness)
+    r = t // 2
+    extra = t - 1 - r
+    minx, miny, maxx, maxy = 0, 0, -1, -1
+    primero = True
+    for x0, y0, x1, y1 in segments:
+        a = min(x0, x1) - r
+        b = min(y0, y1) - r
+        c = max(x0, x1) + extra
+        d = max(y0, y1) + extra
+        if primero:
+            minx, miny, maxx, maxy = a, b, c, d
+            primero = False
+        else:
+            minx = min(minx, a)
+            miny = min(miny, b)
+            maxx = max(maxx, c)
+            maxy = max(maxy, d)
+    return minx, miny, maxx, maxy
+
+
+def _polyline_segments(points, closed):
+    segs = []
+    for i in range(len(points) - 1):
+        segs.append((points[i][0], points[i][1], points[i + 1][0], points[i + 1][1]))
+    if closed and len(points) > 2:
+        segs.append((points[-1][0], points[-1][1], points[0][0], points[0][1]))
+    if len(points) == 1:
+        segs.append((points[0][0], points[0][1], points[0][0], points[0][1]))
+    return segs
+
+
 # ---------- Figuras básicas ----------
 
-def rect(x, y, w, h, fill=None, outline=None, stroke=1, transparent_bg=True):
+def rect(x, y, w, h, fill=None, outline=None, stroke=1, transparent_bg=True, solid=False, cache=False):
     """
     Rectángulo. Si 'fill' es None, no rellena. Si 'outline' es None, no dibuja borde.
     stroke >=1 para grosor de borde.
+    solid=True no crea un Bitmap de w×h: arma el rectángulo con un bitmap 1×1
+    compartido y escalado (ver solid_rect) y devuelve un Group en lugar de un
+    TileGrid. Se ve igual, pero la RAM no depende del área.
+    cache=True reutiliza el Bitmap de otro rect de igual geometría (ver BitmapCache).
     """
+    if solid:
+        pal, idx_fill, idx_outline = _make_palette(fill, outline, False)
+        g = displayio.Group(x=x, y=y)
+        for bx, by, bw, bh, idx in _rect_blocks(w, h, stroke, idx_fill, idx_outline):
+            g.append(_solid_block(bx, by, bw, bh, pal, idx))
+        return g
+
     pal, idx_fill, idx_outline = _make_palette(fill, outline, transparent_bg)
-    colors = len(pal)
-    bmp = _new_bitmap(w, h, colors)
+    key = ("rect", w, h, _key_stroke(stroke, idx_outline), idx_fill is not None, idx_outline is not None)
+    bmp = _shape_bitmap(cache, key, w, h, len(pal),
+                        _draw_rect, 0, 0, w, h, idx_fill, idx_outline, stroke)
+    return displayio.TileGrid(bmp, pixel_shader=pal, x=x, y=y)
 
-    # Relleno
-    if idx_fill is not None:
-        for yy in range(h):
-            for xx in range(w):
-                bmp[xx, yy] = idx_fill
-
-    # Borde
-    if idx_outline is not None and stroke > 0:
-        s = stroke
-        # top
-        for yy in range(min(s, h)):
-            for xx in range(w):
-                bmp[xx, yy] = idx_outline
-        # bottom
-        for yy in range(h - s, h):
-            if yy < 0: continue
-            for xx in range(w):
-                bmp[xx, yy] = idx_outline
-        # left
-        for xx in range(min(s, w)):
-            for yy in range(h):
-                bmp[xx, yy] = idx_outline
-        # right
-        for xx in range(w - s, w):
-            if xx < 0: continue
-            for yy in range(h):
-                bmp[xx, yy] = idx_outline
 
-    return displayio.TileGrid(bmp, pixel_shader=pal, x=x, y=y)
+def solid_rect(x, y, w, h, color):
+    """
+    Rectángulo lleno de un solo color sin Bitmap propio.
+    Devuelve un Group; ocupa lo mismo sea de 10×10 o de 240×135.
+    """
+    pal, idx_fill, _ = _make_palette(color, None, False)
+    return _solid_block(x, y, w, h, pal, idx_fill)
 
 
 def hline(x, y, length, color, transparent_bg=True):
     """Línea horizontal de 1 px de grosor."""
     pal, _, idx_outline = _make_palette(None, color, transparent_bg)
     bmp = _new_bitmap(max(1, length), 1, len(pal))
-    for xx in range(max(1, length)):
-        bmp[xx, 0] = idx_outline
+    bmp.fill(idx_outline)
     return displayio.TileGrid(bmp, pixel_shader=pal, x=x, y=y)
 
 
@@ -115,181 +759,142 @@ def vline(x, y, length, color, transparent_bg=True):
     """Línea vertical de 1 px de grosor."""
     pal, _, idx_outline = _make_palette(None, color, transparent_bg)
     bmp = _new_bitmap(1, max(1, length), len(pal))
-    for yy in range(max(1, length)):
-        bmp[0, yy] = idx_outline
+    bmp.fill(idx_outline)
     return displayio.TileGrid(bmp, pixel_shader=pal, x=x, y=y)
 
 
 def line(x0, y0, x1, y1, color, thickness=1, transparent_bg=True):
-    """Línea con Bresenham. thickness >=1."""
-    # Bounding box del segmento para crear el bitmap pequeño
-    minx = min(x0, x1)
-    miny = min(y0, y1)
-    maxx = max(x0, x1)
-    maxy = max(y0, y1)
-    w = max(1, maxx - minx + 1 + (thickness - 1))
-    h = max(1, maxy - miny + 1 + (thickness - 1))
+    """Línea con Bresenham. thickness >=1 (pincel cuadrado centrado)."""
+    return lines(((x0, y0, x1, y1),), color, thickness=thickness, transparent_bg=transparent_bg)
+
+
+def lines(segments, color, thickness=1, transparent_bg=True, clip=None):
+    """
+    Varios segmentos (x0, y0, x1, y1) rasterizados en un solo bitmap que
+    abarca a todos, con un solo TileGrid y una sola paleta.
+    Las líneas gruesas se pintan por tramos de fila, sin pisar píxeles.
+    clip=(x, y, w, h) recorta al área visible (por ejemplo la pantalla):
+    el bitmap nunca es más grande que ese rectángulo.
+    """
+    minx, miny, maxx, maxy = _lines_bbox(segments, thickness)
+    if clip is not None:
+        cx, cy, cw, ch = clip
+        minx = max(minx, cx)
+        miny = max(miny, cy)
+        maxx = min(maxx, cx + cw - 1)
+        maxy = min(maxy, cy + ch - 1)
 
     pal, _, idx_outline = _make_palette(None, color, transparent_bg)
+    w = maxx - minx + 1
+    h = maxy - miny + 1
     bmp = _new_bitmap(w, h, len(pal))
+    if w > 0 and h > 0:
+        _draw_lines(bmp, minx, miny, segments, thickness, idx_outline)
+    return displayio.TileGrid(bmp, pixel_shader=pal, x=minx, y=miny)
 
-    # Normaliza coords al bitmap local
-    x0l = x0 - minx
-    y0l = y0 - miny
-    x1l = x1 - minx
-    y1l = y1 - miny
-
-    # Bresenham
-    dx = abs(x1l - x0l)
-    dy = -abs(y1l - y0l)
-    sx = 1 if x0l < x1l else -1
-    sy = 1 if y0l < y1l else -1
-    err = dx + dy
-    x, y = x0l, y0l
-
-    while True:
-        # grosor: pintamos un cuadradito thickness x thickness alrededor
-        r = thickness // 2
-        for yy in range(y - r, y - r + thickness):
-            for xx in range(x - r, x - r + thickness):
-                _pset(bmp, xx, yy, idx_outline)
-        if x == x1l and y == y1l:
-            break
-        e2 = 2 * err
-        if e2 >= dy:
-            err += dy
-            x += sx
-        if e2 <= dx:
-            err += dx
-            y += sy
 
-    return displayio.TileGrid(bmp, pixel_shader=pal, x=minx, y=miny)
+def polyline(points, color, thickness=1, closed=False, transparent_bg=True, clip=None):
+    """
+    Trazo que une points [(x, y), ...] en orden (closed=True cierra el
+    último con el primero). Todo va a un solo bitmap; ver lines().
+    """
+    return lines(_polyline_segments(points, closed), color, thickness=thickness,
+                 transparent_bg=transparent_bg, clip=clip)
 
 
 # ---------- Círculo / Elipse ----------
 
-def circle(xc, yc, r, fill=None, outline=None, stroke=1, transparent_bg=True):
+def circle(xc, yc, r, fill=None, outline=None, stroke=1, transparent_bg=True, cache=False):
     """
     Círculo de radio r. fill/outline como en rect. stroke para el grosor del borde.
     El TileGrid se alinea con el bounding box del círculo.
+    cache=True comparte el Bitmap con otros círculos iguales (ver BitmapCache).
     """
+    r = max(0, r)
     d = r * 2 + 1
     pal, idx_fill, idx_outline = _make_palette(fill, outline, transparent_bg)
-    bmp = _new_bitmap(d, d, len(pal))
-
-    # Relleno: scanlines
-    if idx_fill is not None:
-        for y in range(-r, r + 1):
-            # x_max = floor(sqrt(r^2 - y^2))
-            # Aproximación sin sqrt: iremos marcando con círculo de puntos y luego rellenamos entre extremos.
-            pass  # lo hacemos después de dibujar el contorno para conocer límites
-
-    # Algoritmo midpoint para contorno
-    if idx_outline is not None:
-        x = r
-        y = 0
-        err = 1 - r
-        def plot8(cx, cy, px, py, col):
-            _pset(bmp, cx + px, cy + py, col)
-            _pset(bmp, cx + py, cy + px, col)
-            _pset(bmp, cx - py, cy + px, col)
-            _pset(bmp, cx - px, cy + py, col)
-            _pset(bmp, cx - px, cy - py, col)
-            _pset(bmp, cx - py, cy - px, col)
-            _pset(bmp, cx + py, cy - px, col)
-            _pset(bmp, cx + px, cy - py, col)
-
-        while x >= y:
-            # grosor: dibuja anillos de 0..stroke-1
-            for s in range(stroke):
-                plot8(r, r, x - s, y, idx_outline)
-                plot8(r, r, y, x - s, idx_outline)
-            y += 1
-            if err < 0:
-                err += 2 * y + 1
-            else:
-                x -= 1
-                err += 2 * (y - x + 1)
-
-    # Relleno: usa scanline entre los puntos extremos del contorno por fila
-    if idx_fill is not None:
-        for yy in range(d):
-            # Busca primer y último píxel "sólido" del círculo en esta fila,
-            # si no hay contorno, rellena por ecuación.
-            left = None
-            right = None
-            for xx in range(d):
-                if bmp[xx, yy] != 0:  # contorno ya pintado
-                    left = xx
-                    break
-            for xx in range(d - 1, -1, -1):
-                if bmp[xx, yy] != 0:
-                    right = xx
-                    break
-            if left is None or right is None:
-                # no hay contorno; rellenamos por ecuación del círculo
-                dy = yy - r
-                # x_max ≈ int((r*r - dy*dy) ** 0.5)
-                # Evitar float costoso: igual sirve
-                import math
-                x_max = int((r * r - dy * dy) ** 0.5) if (r * r - dy * dy) >= 0 else -1
-                if x_max >= 0:
-                    for xx in range(r - x_max, r + x_max + 1):
-                        bmp[xx, yy] = idx_fill
-            else:
-                for xx in range(left, right + 1):
-                    # Solo pisa fondo (0) para no tapar el borde si existe
-                    if bmp[xx, yy] == 0:
-                        bmp[xx, yy] = idx_fill
-
+    key = ("circle", r, _key_stroke(stroke, idx_outline), idx_fill is not None, idx_outline is not None)
+    bmp = _shape_bitmap(cache, key, d, d, len(pal),
+                        _draw_circle, 0, 0, r, idx_fill, idx_outline, stroke)
     return displayio.TileGrid(bmp, pixel_shader=pal, x=xc - r, y=yc - r)
 
 
-def ellipse(xc, yc, rx, ry, fill=None, outline=None, stroke=1, transparent_bg=True):
+def ellipse(xc, yc, rx, ry, fill=None, outline=None, stroke=1, transparent_bg=True, cache=False):
     """
     Elipse centrada en (xc,yc) con radios rx, ry. Similar a circle().
+    Midpoint entero; con stroke > 1 el borde es el anillo entre la elipse y
+    otra de radios rx - stroke, ry - stroke.
+    cache=True comparte el Bitmap con otras elipses iguales (ver BitmapCache).
     """
-    w = rx * 2 + 1
-    h = ry * 2 + 1
+    rx = max(0, rx)
+    ry = max(0, ry)
     pal, idx_fill, idx_outline = _make_palette(fill, outline, transparent_bg)
-    bmp = _new_bitmap(w, h, len(pal))
-
-    # Contorno por punto-por-punto con ecuación (x^2/rx^2 + y^2/ry^2 ~ 1)
-    # No es el algoritmo más rápido, pero es simple y suficiente en micro.
-    import math
-    def on_edge(x, y):
-        # Cerca de la frontera
-        val = ((x * x) / (rx * rx + 1e-9)) + ((y * y) / (ry * ry + 1e-9))
-        return 0.98 <= val <= 1.02  # banda fina de tolerancia
-
-    if idx_outline is not None:
-        for yy in range(-ry, ry + 1):
-            for xx in range(-rx, rx + 1):
-                if on_edge(xx, yy):
-                    # stroke: ensancha unos píxeles radiales
-                    for s in range(stroke):
-                        _pset(bmp, rx + xx, ry + yy, idx_outline)
-
-    if idx_fill is not None:
-        for yy in range(-ry, ry + 1):
-            # Calcula span horizontal
-            # x_max ~ rx * sqrt(1 - (yy^2/ry^2))
-            frac = 1.0 - (yy * yy) / float(ry * ry + 1e-9)
-            if frac < 0:
-                continue
-            x_max = int(rx * (frac ** 0.5))
-            for xx in range(-x_max, x_max + 1):
-                if bmp[rx + xx, ry + yy] == 0:
-                    bmp[rx + xx, ry + yy] = idx_fill
-
+    key = ("ellipse", rx, ry, _key_stroke(stroke, idx_outline), idx_fill is not None, idx_outline is not None)
+    bmp = _shape_bitmap(cache, key, rx * 2 + 1, ry * 2 + 1, len(pal),
+                        _draw_ellipse, 0, 0, rx, ry, idx_fill, idx_outline, stroke)
     return displayio.TileGrid(bmp, pixel_shader=pal, x=xc - rx, y=yc - ry)
 
 
 # ---------- Triángulo ----------
 
+def _walk_edge(xa, ya, xb, yb, out):
+    """
+    Recorre la arista (xa, ya)->(xb, yb), con ya < yb, y guarda en out[y] el
+    techo exacto de x(y) para ya <= y < yb. Una sola divmod por arista; por
+    fila son solo sumas enteras (el resto 'e' es el error en unidades de dy).
+    """
+    dy = yb - ya
+    step, rem = divmod(xb - xa, dy)
+    x = xa
+    e = 0
+    for y in range(ya, yb):
+        out[y] = x
+        x += step
+        e -= rem
+        if e < 0:
+            x += 1
+            e += dy
+
+
+def _triangle_rows(x0, y0, x1, y1, x2, y2, h):
+    """
+    Filas (izq, der) de un triángulo con regla top-left: una fila y entra si
+    y_arriba <= y < y_abajo y un píxel x si ceil(x_izq) <= x < ceil(x_der).
+    Así dos triángulos con una arista en común no dejan huecos ni la pintan
+    dos veces, y se pueden armar polígonos y mallas con ellos.
+    """
+    left = [1] * h
+    right = [0] * h
+    # Ordena por y (sin sorted/lambda)
+    if y1 < y0:
+        x0, y0, x1, y1 = x1, y1, x0, y0
+    if y2 < y1:
+        x1, y1, x2, y2 = x2, y2, x1, y1
+        if y1 < y0:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+    cross = (x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0)
+    if cross == 0:
+        return left, right  # área cero
+    largo = [0] * h
+    corto = [0] * h
+    _walk_edge(x0, y0, x2, y2, largo)
+    if y0 < y1:
+        _walk_edge(x0, y0, x1, y1, corto)
+    if y1 < y2:
+        _walk_edge(x1, y1, x2, y2, corto)
+    # cross > 0: el vértice del medio queda a la derecha de la arista larga
+    izq, der = (largo, corto) if cross > 0 else (corto, largo)
+    for y in range(y0, y2):
+        left[y] = izq[y]
+        right[y] = der[y] - 1
+    return left, right
+
+
 def triangle(x0, y0, x1, y1, x2, y2, fill=None, outline=None, transparent_bg=True):
     """
-    Triángulo lleno por scanline. Outline simple sobre el mismo bitmap.
+    Triángulo lleno por scanline (regla top-left, ver _triangle_rows).
+    El outline (Bresenham) va por tramos de fila y el relleno ocupa solo lo
+    que queda entre ellos, sin pisar píxeles.
     """
     # Bounding box
     minx = min(x0, x1, x2)
@@ -299,170 +904,127 @@ def triangle(x0, y0, x1, y1, x2, y2, fill=None, outline=None, transparent_bg=Tru
 
     pal, idx_fill, idx_outline = _make_palette(fill, outline, transparent_bg)
     bmp = _new_bitmap(max(1, maxx - minx + 1), max(1, maxy - miny + 1), len(pal))
-
-    # Normaliza a coords locales
-    x0 -= minx; y0 -= miny
-    x1 -= minx; y1 -= miny
-    x2 -= minx; y2 -= miny
-
-    # Relleno con scanline
-    if idx_fill is not None:
-        # Ordena por y
-        pts = sorted([(x0, y0), (x1, y1), (x2, y2)], key=lambda p: p[1])
-        (x0, y0), (x1, y1), (x2, y2) = pts
-
-        def edge_interpolate(y, xa, ya, xb, yb):
-            if ya == yb:
-                return xa
-            t = (y - ya) / float(yb - ya)
-            return int(xa + t * (xb - xa))
-
-        for y in range(y0, y2 + 1):
-            if y < y1:
-                xl = edge_interpolate(y, x0, y0, x1, y1)
-                xr = edge_interpolate(y, x0, y0, x2, y2)
-            else:
-                xl = edge_interpolate(y, x1, y1, x2, y2)
-                xr = edge_interpolate(y, x0, y0, x2, y2)
-            if xl > xr:
-                xl, xr = xr, xl
-            for x in range(xl, xr + 1):
-                bmp[x, y] = idx_fill
-
-    # Outline (Bresenham sobre el mismo bmp)
-    if idx_outline is not None:
-        def draw_line(xx0, yy0, xx1, yy1):
-            dx = abs(xx1 - xx0)
-            dy = -abs(yy1 - yy0)
-            sx = 1 if xx0 < xx1 else -1
-            sy = 1 if yy0 < yy1 else -1
-            err = dx + dy
-            x, y = xx0, yy0
-            while True:
-                _pset(bmp, x, y, idx_outline)
-                if x == xx1 and y == yy1:
-                    break
-                e2 = 2 * err
-                if e2 >= dy:
-                    err += dy
-                    x += sx
-                if e2 <= dx:
-                    err += dx
-                    y += sy
-
-        draw_line(x0, y0, x1, y1)
-        draw_line(x1, y1, x2, y2)
-        draw_line(x2, y2, x0, y0)
-
+    _draw_triangle(bmp, x0 - minx, y0 - miny, x1 - minx, y1 - miny, x2 - minx, y2 - miny,
+                   idx_fill, idx_outline)
     return displayio.TileGrid(bmp, pixel_shader=pal, x=minx, y=miny)
 
 
 # ---------- Rounded Rect ----------
 
-def rounded_rect(x, y, w, h, r, fill=None, outline=None, stroke=1, transparent_bg=True):
+def rounded_rect(x, y, w, h, r, fill=None, outline=None, stroke=1, transparent_bg=True, cache=False):
     """
     Rectángulo con esquinas redondeadas. r = radio de la esquina.
+    cache=True comparte el Bitmap con otros iguales (ver BitmapCache).
     """
     if r < 1:
-        return rect(x, y, w, h, fill=fill, outline=outline, stroke=stroke, transparent_bg=transparent_bg)
+        return rect(x, y, w, h, fill=fill, outline=outline, stroke=stroke,
+                    transparent_bg=transparent_bg, cache=cache)
 
     pal, idx_fill, idx_outline = _make_palette(fill, outline, transparent_bg)
-    bmp = _new_bitmap(w, h, len(pal))
+    key = ("rounded_rect", w, h, r, _key_stroke(stroke, idx_outline), idx_fill is not None, idx_outline is not None)
+    bmp = _shape_bitmap(cache, key, w, h, len(pal),
+                        _draw_rounded_rect, 0, 0, w, h, r, idx_fill, idx_outline, stroke)
+    return displayio.TileGrid(bmp, pixel_shader=pal, x=x, y=y)
 
-    # Centro (rectángulo sin las esquinas)
-    if idx_fill is not None:
-        # zona central horizontal
-        for yy in range(r, h - r):
-            for xx in range(w):
-                bmp[xx, yy] = idx_fill
-        # tapas superior e inferior (rectas)
-        for yy in range(r):
-            for xx in range(r, w - r):
-                bmp[xx, yy] = idx_fill
-        for yy in range(h - r, h):
-            for xx in range(r, w - r):
-                bmp[xx, yy] = idx_fill
-
-    # Esquinas redondeadas: cuadrantes de un círculo
-    def paint_corner(cx, cy, rr, fill_idx):
-        import math
-        for yy in range(-rr, rr + 1):
-            for xx in range(-rr, rr + 1):
-                if xx * xx + yy * yy <= rr * rr:
-                    X = cx + xx
-                    Y = cy + yy
-                    if 0 <= X < w and 0 <= Y < h and fill_idx is not None:
-                        # Solo pisa fondo
-                        if bmp[X, Y] == 0:
-                            bmp[X, Y] = fill_idx
 
-    if idx_fill is not None:
-        # top-left
-        paint_corner(r, r, r, idx_fill)
-        # top-right
-        paint_corner(w - r - 1, r, r, idx_fill)
-        # bottom-left
-        paint_corner(r, h - r - 1, r, idx_fill)
-        # bottom-right
-        paint_corner(w - r - 1, h - r - 1, r, idx_fill)
-
-    # Outline: usa rect + círculos huecos
-    if idx_outline is not None and stroke > 0:
-        # bordes rectos
-        s = stroke
-        # top horizontal
-        for yy in range(min(s, h)):
-            for xx in range(r, w - r):
-                bmp[xx, yy] = idx_outline
-        # bottom horizontal
-        for yy in range(h - s, h):
-            for xx in range(r, w - r):
-                bmp[xx, yy] = idx_outline
-        # left vertical
-        for xx in range(min(s, w)):
-            for yy in range(r, h - r):
-                bmp[xx, yy] = idx_outline
-        # right vertical
-        for xx in range(w - s, w):
-            for yy in range(r, h - r):
-                bmp[xx, yy] = idx_outline
-
-        # esquinas: dibuja circunferencia de radio r en los cuatro cuadrantes
-        def plot_ring(cx, cy):
-            # midpoint simple
-            rr = r
-            x = rr
-            y = 0
-            err = 1 - rr
-            def plot8(px, py):
-                _pset(bmp, cx + px, cy + py, idx_outline)
-                _pset(bmp, cx + py, cy + px, idx_outline)
-                _pset(bmp, cx - py, cy + px, idx_outline)
-                _pset(bmp, cx - px, cy + py, idx_outline)
-                _pset(bmp, cx - px, cy - py, idx_outline)
-                _pset(bmp, cx - py, cy - px, idx_outline)
-                _pset(bmp, cx + py, cy - px, idx_outline)
-                _pset(bmp, cx + px, cy - py, idx_outline)
-
-            while x >= y:
-                for st in range(stroke):
-                    plot8(x - st, y)
-                    plot8(y, x - st)
-                y += 1
-                if err < 0:
-                    err += 2 * y + 1
-                else:
-                    x -= 1
-                    err += 2 * (y - x + 1)
-
-        # top-left
-        plot_ring(r, r)
-        # top-right
-        plot_ring(w - r - 1, r)
-        # bottom-left
-        plot_ring(r, h - r - 1)
-        # bottom-right
-        plot_ring(w - r - 1, h - r - 1)
+# ---------- Canvas ----------
 
-    return displayio.TileGrid(bmp, pixel_shader=pal, x=x, y=y)
+class Canvas:
+    """
+    Lienzo: todas las figuras se dibujan en un único Bitmap con un único
+    TileGrid (canvas.tilegrid), en lugar de un TileGrid por figura, así
+    displayio compone una sola capa.
+    Los métodos reciben lo mismo que las funciones del módulo, pero fill y
+    outline son índices de la paleta del canvas, no colores.
+    'dirty' es el rectángulo (x0, y0, x1, y1) inclusivo tocado desde el
+    último refresh, o None si no cambió nada.
+    """
 
+    def __init__(self, width, height, palette, x=0, y=0):
+        self.palette = palette
+        self.bitmap = displayio.Bitmap(width, height, len(palette))
+        self.tilegrid = displayio.TileGrid(self.bitmap, pixel_shader=palette, x=x, y=y)
+        self.dirty = None
+
+    @property
+    def width(self):
+        return self.bitmap.width
+
+    @property
+    def height(self):
+        return self.bitmap.height
+
+    def _touch(self, x0, y0, x1, y1):
+        """Suma la caja inclusiva (x0, y0)-(x1, y1), recortada, al área sucia."""
+        x0 = max(0, x0)
+        y0 = max(0, y0)
+        x1 = min(self.bitmap.width - 1, x1)
+        y1 = min(self.bitmap.height - 1, y1)
+        if x0 > x1 or y0 > y1:
+            return
+        d = self.dirty
+        if d is None:
+            self.dirty = (x0, y0, x1, y1)
+        else:
+            self.dirty = (min(d[0], x0), min(d[1], y0), max(d[2], x1), max(d[3], y1))
+
+    def take_dirty(self):
+        """Devuelve el área sucia y la limpia."""
+        d = self.dirty
+        self.dirty = None
+        return d
+
+    def refresh(self, display):
+        """
+        Refresca el display solo si algo cambió. displayio ya envía solo la
+        zona modificada del bitmap; esto evita el refresh cuando no hay nada.
+        """
+        if self.dirty is None:
+            return False
+        display.refresh()
+        self.dirty = None
+        return True
+
+    def clear(self, color_index=0):
+        self.bitmap.fill(color_index)
+        self._touch(0, 0, self.bitmap.width - 1, self.bitmap.height - 1)
+
+    def rect(self, x, y, w, h, fill=None, outline=None, stroke=1):
+        _draw_rect(self.bitmap, x, y, w, h, fill, outline, stroke)
+        self._touch(x, y, x + w - 1, y + h - 1)
+
+    def hline(self, x, y, length, color):
+        self.rect(x, y, max(1, length), 1, fill=color)
+
+    def vline(self, x, y, length, color):
+        self.rect(x, y, 1, max(1, length), fill=color)
+
+    def lines(self, segments, color, thickness=1):
+        _draw_lines(self.bitmap, 0, 0, segments, thickness, color)
+        minx, miny, maxx, maxy = _lines_bbox(segments, thickness)
+        self._touch(minx, miny, maxx, maxy)
+
+    def line(self, x0, y0, x1, y1, color, thickness=1):
+        self.lines(((x0, y0, x1, y1),), color, thickness)
+
+    def polyline(self, points, color, thickness=1, closed=False):
+        self.lines(_polyline_segments(points, closed), color, thickness)
+
+    def circle(self, xc, yc, r, fill=None, outline=None, stroke=1):
+        r = max(0, r)
+        _draw_circle(self.bitmap, xc - r, yc - r, r, fill, outline, stroke)
+        self._touch(xc - r, yc - r, xc + r, yc + r)
+
+    def ellipse(self, xc, yc, rx, ry, fill=None, outline=None, stroke=1):
+        rx = max(0, rx)
+        ry = max(0, ry)
+        _draw_ellipse(self.bitmap, xc - rx, yc - ry, rx, ry, fill, outline, stroke)
+        self._touch(xc - rx, yc - ry, xc + rx, yc + ry)
+
+    def triangle(self, x0, y0, x1, y1, x2, y2, fill=None, outline=None):
+        _draw_triangle(self.bitmap, x0, y0, x1, y1, x2, y2, fill, outline)
+        self._touch(min(x0, x1, x2), min(y0, y1, y2), max(x0, x1, x2), max(y0, y1, y2))
+
+    def rounded_rect(self, x, y, w, h, r, fill=None, outline=None, stroke=1):
+        _draw_rounded_rect(self.bitmap, x, y, w, h, r, fill, outline, stroke)
+        self._touch(x, y, x + w - 1, y + h - 1)
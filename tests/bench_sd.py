@@ -0,0 +1,68 @@
+# Mide en la PC cuántas escrituras por segundo bajan a la SD con las
+# distintas formas de escribir de sd_manager.py, sobre una carpeta temporal
+# con las reglas de FAT (SistemaFat de tests/conftest.py). No es un test: se
+# corre a mano. Los números sólo sirven para comparar entre sí; en la placa
+# manda la latencia de la tarjeta.
+#
+#   python tests/bench_sd.py
+
+import os
+import sys
+import tempfile
+import time
+
+_AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_AQUI, "stubs"))
+sys.path.append(os.path.dirname(_AQUI))
+
+import sd_manager  # noqa: E402
+from conftest import SistemaFat  # noqa: E402  (rename no pisa, como FAT)
+
+N = 2000
+
+
+def por_segundo(fn, n=N):
+    t = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - t)
+
+
+def registros(sd, raiz):
+    """Registro.linea contra un anexar_archivo (abrir/escribir/cerrar) por fila."""
+    print(f"{N} filas CSV")
+    r = por_segundo(lambda i: sd.anexar_archivo("a.csv", f"{i},{i * 0.5:.2f},23.41\n"))
+    print(f"  {'anexar_archivo':16} {r:10,.0f} registros/s")
+    with sd.logger("b.csv") as reg:
+        r = por_segundo(lambda i: reg.linea(i, f"{i * 0.5:.2f}", "23.41"))
+    print(f"  {'logger':16} {r:10,.0f} registros/s  ({reg.flushes} flushes)")
+    with open(os.path.join(raiz, "a.csv")) as a, open(os.path.join(raiz, "b.csv")) as b:
+        assert a.read() == b.read()
+
+
+def modos(sd, sistema):
+    """Reescribir una configuración chica: normal, atómico y slots A/B."""
+    contenido = "modo=1\nbrillo=80\nintervalo=5\n"
+    escrituras = [
+        ("normal", lambda i: sd.escribir_archivo("c.cfg", contenido)),
+        ("atomico", lambda i: sd.escribir_archivo("c.cfg", contenido, atomico=True)),
+        ("slot A/B", lambda i: sd.escribir_slot("c.cfg", contenido)),
+    ]
+    print(f"{N} reescrituras de {len(contenido)} bytes")
+    for modo, fn in escrituras:
+        sistema.cambios = 0
+        r = por_segundo(fn)
+        print(f"  {modo:16} {r:10,.0f} escrituras/s  ({sistema.cambios / N:.0f} cambios de directorio c/u)")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as raiz:
+        sistema = SistemaFat()
+        sd_manager.os = sistema
+        sd = sd_manager.SDManager(mount_point=raiz, informe=sd_manager.SILENCIO)
+        registros(sd, raiz)
+        modos(sd, sistema)
+
+
+if __name__ == "__main__":
+    main()
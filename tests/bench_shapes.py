@@ -0,0 +1,69 @@
+# Cuenta cuántas veces tocan el Bitmap las figuras de shapes.py (y cuánto
+# tardan en la PC). No es un test: se corre a mano.
+#
+#   python tests/bench_shapes.py                   # shapes.py actual
+#   python tests/bench_shapes.py viejo/shapes.py   # y además otra versión
+#
+# Para comparar con una versión anterior:
+#   git show <commit>:shapes.py > /tmp/shapes_viejo.py
+
+import importlib.util
+import os
+import sys
+import time
+import types
+
+_AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_AQUI, "stubs"))
+sys.path.append(os.path.dirname(_AQUI))
+
+import displayio  # noqa: E402  (el de tests/stubs)
+
+# (nombre, función, args, kwargs)
+CASOS = [
+    ("rect 240x30 fill", "rect", (0, 0, 240, 30), {"fill": 1}),
+    ("rect 240x30 fill+stroke 2", "rect", (0, 0, 240, 30), {"fill": 1, "outline": 2, "stroke": 2}),
+    ("rounded_rect 100x40 r8 fill", "rounded_rect", (0, 0, 100, 40, 8), {"fill": 1}),
+    ("rounded_rect 100x40 r8 fill+stroke 2", "rounded_rect", (0, 0, 100, 40, 8), {"fill": 1, "outline": 2, "stroke": 2}),
+    ("circle r60 fill", "circle", (60, 60, 60), {"fill": 1}),
+    ("circle r60 fill+outline", "circle", (60, 60, 60), {"fill": 1, "outline": 2}),
+    ("circle r60 fill+stroke 4", "circle", (60, 60, 60), {"fill": 1, "outline": 2, "stroke": 4}),
+]
+
+
+def cargar(ruta, nombre):
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def medir(mod, fn, args, kwargs):
+    displayio.reiniciar_contador()
+    t = time.perf_counter()
+    getattr(mod, fn)(*args, **kwargs)
+    dt = time.perf_counter() - t
+    c = dict(displayio.CONTADOR)
+    return c["get"] + c["set"], c["fill"], c["region"], dt * 1000
+
+
+def main(otras):
+    rutas = [("actual", os.path.join(os.path.dirname(_AQUI), "shapes.py"))]
+    rutas += [(r, r) for r in otras]
+    region = types.SimpleNamespace(fill_region=displayio.fill_region)
+    print(f"{'caso':36} {'versión':40} {'get+set':>8} {'fill':>5} {'region':>7} {'ms':>8}")
+    for titulo, fn, args, kwargs in CASOS:
+        for i, (etiqueta, ruta) in enumerate(rutas):
+            mod = cargar(ruta, f"shapes_bench_{i}")
+            for modo, bt in (("bitmaptools", region), ("sin bitmaptools", None)):
+                if hasattr(mod, "bitmaptools"):
+                    mod.bitmaptools = bt
+                elif modo == "sin bitmaptools":
+                    continue  # versión que no usa bitmaptools: una sola fila
+                n, fills, regiones, ms = medir(mod, fn, args, kwargs)
+                version = etiqueta if not hasattr(mod, "bitmaptools") else f"{etiqueta} ({modo})"
+                print(f"{titulo:36} {version:40} {n:8} {fills:5} {regiones:7} {ms:8.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,117 @@
+# Los tests corren en la PC: shapes.py y sd_manager.py desde la raíz del
+# repo y los módulos de la placa (displayio, board, sdcardio, ...) desde
+# tests/stubs, imitaciones mínimas sin hardware.
+# La raíz va al final de sys.path: su code.py taparía el módulo code de la
+# biblioteca estándar, que pytest usa (vía pdb).
+import errno
+import os
+import sys
+
+import pytest
+
+_AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_AQUI, "stubs"))
+sys.path.append(os.path.dirname(_AQUI))
+
+
+@pytest.fixture(autouse=True)
+def placa():
+    """Cada test arranca con la tarjeta puesta y la pantalla sin refrescar."""
+    import board
+    import sdcardio
+    import storage
+
+    sdcardio.reiniciar()
+    storage.reiniciar()
+    board.DISPLAY = board.Pantalla()
+
+
+@pytest.fixture
+def sd(tmp_path):
+    """SDManager montado sobre una carpeta temporal, sin mensajes."""
+    import sd_manager
+
+    return sd_manager.SDManager(mount_point=str(tmp_path), informe=sd_manager.SILENCIO)
+
+
+class CorteDeLuz(BaseException):
+    """
+    La tarjeta se quedó sin alimentación en medio de una operación. No es
+    Exception para que ningún 'except Exception' de sd_manager lo ataje: tras
+    un corte no corre más código.
+    """
+
+
+class SistemaFat:
+    """
+    El os de la PC con las mañas de FAT en CircuitPython: rename no pisa un
+    destino existente y remove no borra carpetas. Cuenta las llamadas que
+    en la placa irían por SPI a leer directorios (stat, listdir, ilistdir)
+    y las que cambian un directorio (rename, remove, rmdir, mkdir).
+    Con ilistdir=True ofrece además os.ilistdir como el de MicroPython.
+    Con corte_en=n, el cambio de directorio número n (desde 0) no llega a
+    hacerse: lanza CorteDeLuz.
+    """
+
+    Corte = CorteDeLuz
+
+    def __init__(self, ilistdir=False):
+        self.llamadas = 0
+        self.cambios = 0
+        self.corte_en = None
+        if ilistdir:
+            self.ilistdir = self._ilistdir
+
+    def __getattr__(self, nombre):
+        return getattr(os, nombre)
+
+    def _cambio(self):
+        if self.corte_en is not None and self.cambios >= self.corte_en:
+            raise CorteDeLuz()
+        self.cambios += 1
+
+    def stat(self, ruta):
+        self.llamadas += 1
+        return os.stat(ruta)
+
+    def listdir(self, ruta):
+        self.llamadas += 1
+        return os.listdir(ruta)
+
+    def _ilistdir(self, ruta):
+        self.llamadas += 1
+        for e in os.scandir(ruta):
+            yield (e.name, 0x4000 if e.is_dir() else 0x8000, 0, e.stat().st_size)
+
+    def rename(self, origen, destino):
+        self._cambio()
+        if os.path.exists(destino):
+            raise OSError(errno.EEXIST, "EEXIST")
+        os.rename(origen, destino)
+
+    def remove(self, ruta):
+        self._cambio()
+        if os.path.isdir(ruta):
+            raise OSError(errno.EISDIR, "EISDIR")
+        os.remove(ruta)
+
+    def rmdir(self, ruta):
+        self._cambio()
+        os.rmdir(ruta)
+
+    def mkdir(self, ruta):
+        self._cambio()
+        os.mkdir(ruta)
+
+
+@pytest.fixture
+def fat(monkeypatch):
+    """Reemplaza el os de sd_manager por un SistemaFat y lo devuelve."""
+    import sd_manager
+
+    def instalar(ilistdir=False):
+        sistema = SistemaFat(ilistdir)
+        monkeypatch.setattr(sd_manager, "os", sistema)
+        return sistema
+
+    return instalar
@@ -0,0 +1,23 @@
+# Imitación de board para la PC: los pines de la SD y una pantalla que
+# cuenta sus refresh().
+
+SD_SCK = "SD_SCK"
+SD_MOSI = "SD_MOSI"
+SD_MISO = "SD_MISO"
+SD_CS = "SD_CS"
+
+
+class Pantalla:
+    width = 240
+    height = 135
+
+    def __init__(self):
+        self.auto_refresh = True
+        self.root_group = None
+        self.refreshes = 0
+
+    def refresh(self, **kwargs):
+        self.refreshes += 1
+
+
+DISPLAY = Pantalla()
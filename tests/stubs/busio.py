@@ -0,0 +1,18 @@
+# Imitación de busio para la PC: un SPI que no hace nada.
+
+
+class SPI:
+    def __init__(self, clock, MOSI=None, MISO=None):
+        self.pines = (clock, MOSI, MISO)
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def configure(self, **kwargs):
+        pass
+
+    def deinit(self):
+        pass
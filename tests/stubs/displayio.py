@@ -0,0 +1,91 @@
+# Imitación mínima de displayio para correr shapes.py en la PC.
+# Cuenta los accesos al Bitmap para los benchmarks (ver bench_shapes.py).
+
+CONTADOR = {"get": 0, "set": 0, "fill": 0, "region": 0}
+
+
+def reiniciar_contador():
+    for k in CONTADOR:
+        CONTADOR[k] = 0
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self._d = bytearray(width * height)
+
+    def __getitem__(self, xy):
+        CONTADOR["get"] += 1
+        x, y = xy
+        assert 0 <= x < self.width and 0 <= y < self.height, xy
+        return self._d[y * self.width + x]
+
+    def __setitem__(self, xy, v):
+        CONTADOR["set"] += 1
+        x, y = xy
+        assert 0 <= x < self.width and 0 <= y < self.height, xy
+        assert 0 <= v < self.value_count, v
+        self._d[y * self.width + x] = v
+
+    def fill(self, v):
+        CONTADOR["fill"] += 1
+        self._d = bytearray([v]) * (self.width * self.height)
+
+
+class Palette:
+    def __init__(self, n):
+        self._c = [0] * n
+        self.transparentes = set()
+
+    def __len__(self):
+        return len(self._c)
+
+    def __getitem__(self, i):
+        return self._c[i]
+
+    def __setitem__(self, i, v):
+        self._c[i] = v
+
+    def make_transparent(self, i):
+        self.transparentes.add(i)
+
+    def make_opaque(self, i):
+        self.transparentes.discard(i)
+
+
+class TileGrid:
+    def __init__(self, bitmap, pixel_shader=None, x=0, y=0, width=1, height=1,
+                 tile_width=None, tile_height=None, default_tile=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width or bitmap.width
+        self.tile_height = tile_height or bitmap.height
+        self._tiles = {}
+
+    def __getitem__(self, xy):
+        return self._tiles.get(xy, 0)
+
+    def __setitem__(self, xy, tile):
+        self._tiles[xy] = tile
+
+
+class Group(list):
+    def __init__(self, scale=1, x=0, y=0):
+        super().__init__()
+        self.scale = scale
+        self.x = x
+        self.y = y
+
+
+def fill_region(bmp, x1, y1, x2, y2, value):
+    """Como bitmaptools.fill_region (se engancha desde los tests)."""
+    CONTADOR["region"] += 1
+    for y in range(y1, y2):
+        i = y * bmp.width
+        bmp._d[i + x1:i + x2] = bytearray([value]) * (x2 - x1)
@@ -0,0 +1,42 @@
+# Imitación de sdcardio para la PC. La tarjeta puede faltar (FALLA = un
+# errno, p. ej. 19) y por encima de LIMITE Hz devuelve sectores con un bit
+# cambiado, como una tarjeta con cables largos (para sondear_baudrate).
+# INICIOS guarda el baudrate de cada SDCard que se intentó crear.
+
+FALLA = None
+LIMITE = 16000000
+BLOQUES = 2048
+INICIOS = []
+
+_IMAGEN = bytes((i * 31) & 0xFF for i in range(512 * 8))
+
+
+def reiniciar():
+    global FALLA, LIMITE
+    FALLA = None
+    LIMITE = 16000000
+    del INICIOS[:]
+
+
+class SDCard:
+    def __init__(self, spi, cs, baudrate=8000000):
+        INICIOS.append(baudrate)
+        if FALLA is not None:
+            raise OSError(FALLA, "no hay tarjeta")
+        self.baudrate = baudrate
+        self._lecturas = 0
+
+    def count(self):
+        return BLOQUES
+
+    def readblocks(self, inicio, buf):
+        if FALLA is not None:
+            raise OSError(FALLA, "no hay tarjeta")
+        self._lecturas += 1
+        i = (inicio * 512) % len(_IMAGEN)
+        buf[:] = (_IMAGEN[i:] + _IMAGEN)[:len(buf)]
+        if self.baudrate > LIMITE and self._lecturas % 2 == 0:
+            buf[5] ^= 1
+
+    def deinit(self):
+        pass
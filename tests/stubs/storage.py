@@ -0,0 +1,22 @@
+# Imitación de storage para la PC: el "volumen" es la carpeta que se pasa
+# como punto de montaje; solo se anota qué está montado.
+
+MONTADOS = []
+
+
+def reiniciar():
+    del MONTADOS[:]
+
+
+class VfsFat:
+    def __init__(self, dispositivo):
+        self.dispositivo = dispositivo
+
+
+def mount(vfs, ruta, readonly=False):
+    MONTADOS.append(ruta)
+
+
+def umount(ruta):
+    if ruta in MONTADOS:
+        MONTADOS.remove(ruta)
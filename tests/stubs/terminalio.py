@@ -0,0 +1,37 @@
+# Imitación de terminalio para la PC: una fuente de 6x14 que solo tiene
+# los caracteres ASCII imprimibles.
+
+import displayio
+
+
+class _Glifo:
+    def __init__(self, tile_index):
+        self.tile_index = tile_index
+
+
+class _Fuente:
+    bitmap = displayio.Bitmap(6 * 95, 14, 2)
+
+    def get_bounding_box(self):
+        return (6, 14)
+
+    def get_glyph(self, codigo):
+        if 32 <= codigo < 127:
+            return _Glifo(codigo - 32)
+        return None
+
+
+FONT = _Fuente()
+
+
+class Terminal:
+    def __init__(self, grid, font):
+        self.grid = grid
+        self.col = 0
+
+    def write(self, texto):
+        for c in texto:
+            glifo = FONT.get_glyph(ord(c))
+            if glifo is not None:
+                self.grid[self.col, 0] = glifo.tile_index
+            self.col += 1
@@ -0,0 +1,132 @@
+# Caché de directorios de SDManager: lo que responde tiene que coincidir
+# con el disco, y tiene que ahorrar llamadas reales (cada una va por SPI).
+# Correr con: python -m pytest (desde la raíz)
+
+import os
+import random
+
+import pytest
+
+import sd_manager
+
+
+@pytest.mark.parametrize("abrir", ["logger", "logger_binario"])
+def test_registro_nuevo_aparece_sin_esperar_al_flush(sd, tmp_path, abrir):
+    assert sd.listar("/") == []
+    if abrir == "logger":
+        reg = sd.logger("nuevo.log")
+    else:
+        reg = sd.logger_binario("nuevo.log", "t,v", "If")
+    assert (tmp_path / "nuevo.log").exists()
+    assert sd.existe("nuevo.log")
+    assert sd.listar("/") == ["nuevo.log"]
+    reg.close()
+    assert sd.listar("/") == ["nuevo.log"]
+
+
+def tarjeta(raiz):
+    """Raíz con 5 archivos y 3 carpetas de 20 archivos y una subcarpeta."""
+    for d in "abc":
+        os.makedirs(raiz / d / "sub")
+        for i in range(20):
+            (raiz / d / f"f{i}.txt").write_text("x" * i)
+    for i in range(1, 6):
+        (raiz / f"archivo {i}.txt").write_text("h")
+
+
+# Llamadas reales a stat/listdir/ilistdir (en la placa, lecturas por SPI).
+# Sin caché eran 9 en el arranque, 158 en los dos recorridos y 26 al borrar.
+@pytest.mark.parametrize("ilistdir, arranque, recorrer, borrar", [
+    (False, 6, 72, 0),
+    (True, 1, 6, 0),
+], ids=["listdir", "ilistdir"])
+def test_llamadas_ahorradas(tmp_path, fat, ilistdir, arranque, recorrer, borrar):
+    tarjeta(tmp_path)
+    sistema = fat(ilistdir)
+    hechas = []
+
+    def medir():
+        # el contador de SDManager tiene que coincidir con las llamadas reales
+        assert sd.estadisticas_cache()["llamadas"] == sistema.llamadas
+        hechas.append(sistema.llamadas - sum(hechas))
+
+    # lo que hace code.py al arrancar
+    sd = sd_manager.SDManager(mount_point=str(tmp_path), informe=sd_manager.SILENCIO)
+    sd.listar("/")
+    sd.crear_archivo("archivo 6.txt", "hola\n")
+    sd.detalles_tarjeta()
+    for i in range(1, 8):
+        assert sd.existe(f"archivo {i}.txt") == (i <= 6)
+    medir()
+
+    for _ in range(2):
+        assert len(list(sd.listar_recursivo("/"))) == 72
+    medir()
+
+    assert sd.borrar_directorio("a", recursivo=True)
+    medir()
+    assert not (tmp_path / "a").exists()
+    assert hechas == [arranque, recorrer, borrar]
+    assert sd.estadisticas_cache()["ahorradas"] > 0
+
+
+NOMBRES = ["a", "b", "d1", "d1/x", "d1/d2", "d1/d2/y", "d3", "z.txt"]
+
+
+def operacion(sd, raiz, rnd):
+    """Una operación al azar; si abre un logger, lo devuelve para cerrarlo después."""
+    a = rnd.choice(NOMBRES)
+    b = rnd.choice(NOMBRES)
+    op = rnd.randrange(12)
+    ruta = raiz / a
+    if op == 0:
+        sd.crear_archivo(a, "hi")
+    elif op == 1:
+        sd.escribir_archivo(a, "x" * rnd.randint(0, 9))
+    elif op == 2:
+        sd.anexar_archivo(a, "yy")
+    elif op == 3:
+        sd.crear_directorio(a)
+    elif op == 4:
+        sd.borrar_archivo(a)
+    elif op == 5:
+        sd.borrar_directorio(a, recursivo=rnd.random() < 0.5)
+    elif op == 6:
+        sd.renombrar_archivo(a, b)
+    elif op == 7:
+        sd.copiar_archivo(a, b, sobrescribir=rnd.random() < 0.5)
+    elif op == 8:
+        sd.mover_archivo(a, b, sobrescribir=rnd.random() < 0.5)
+    elif op == 9:
+        if not ruta.is_dir() and ruta.parent.is_dir():
+            # queda abierto durante las comprobaciones de este paso
+            reg = sd.logger(a, indice=4)
+            reg.linea(1, 2)
+            return reg
+    elif op == 10:
+        if ruta.is_file():
+            sd.reemplazar_texto(a, "y", "QQ")
+    elif ruta.is_file():
+        sd.tail(a, 2)
+
+
+@pytest.mark.parametrize("ilistdir", [False, True], ids=["listdir", "ilistdir"])
+def test_cache_coincide_con_el_disco(tmp_path, fat, ilistdir):
+    fat(ilistdir)
+    sd = sd_manager.SDManager(mount_point=str(tmp_path), informe=sd_manager.SILENCIO)
+    sd._MAX_DIRS = 3  # que también se desalojen directorios
+    rnd = random.Random(7)
+    for paso in range(4000):
+        reg = operacion(sd, tmp_path, rnd)
+        assert sorted(sd.listar("/")) == sorted(os.listdir(tmp_path)), paso
+        for n in NOMBRES + [n + ".idx" for n in NOMBRES]:
+            p = tmp_path / n
+            assert sd.existe(n) == p.exists(), (paso, n)
+            assert sd.es_directorio(n) == p.is_dir(), (paso, n)
+            if p.is_file():
+                assert sd._info(str(p))[1] == p.stat().st_size, (paso, n)
+            elif p.is_dir():
+                assert sorted(sd.listar(n)) == sorted(os.listdir(p)), (paso, n)
+        if reg is not None:
+            reg.close()
+    assert sd.estadisticas_cache()["ahorradas"] > 0
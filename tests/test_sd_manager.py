@@ -0,0 +1,359 @@
+# SDManager y su frente asyncio sobre la tarjeta de mentira de tests/stubs.
+# Correr con: python -m pytest (desde la raíz)
+
+import asyncio
+import os
+import runpy
+import time
+
+import pytest
+
+import board
+import sdcardio
+import sd_manager
+
+CODE_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code.py")
+
+
+def correr(coro):
+    return asyncio.run(coro)
+
+
+# ---------------------- SDAsincrono ----------------------
+
+def test_asincrono_escribe_anexa_y_copia(sd, tmp_path):
+    sda = sd_manager.SDAsincrono(sd)
+    datos = bytes(range(256)) * 40
+    assert correr(sda.escribir("a.bin", datos, tam_bloque=512))
+    assert correr(sda.anexar("a.bin", b"fin", tam_bloque=512))
+    assert correr(sda.copiar("a.bin", "b.bin", tam_bloque=512))
+    assert (tmp_path / "b.bin").read_bytes() == datos + b"fin"
+    assert not correr(sda.copiar("a.bin", "b.bin"))  # ya existe
+    assert sd.estado[0] == sd_manager.YA_EXISTE
+
+
+def test_asincrono_crear_no_pisa(sd, tmp_path):
+    (tmp_path / "ya.txt").write_text("original")
+    sda = sd_manager.SDAsincrono(sd)
+    assert not correr(sda.crear("ya.txt", "nuevo"))
+    assert sd.estado[0] == sd_manager.YA_EXISTE
+    assert (tmp_path / "ya.txt").read_text() == "original"
+    assert correr(sda.crear("otro.txt", "nuevo"))
+    assert sd.existe("otro.txt") and (tmp_path / "otro.txt").read_text() == "nuevo"
+
+
+def test_asincrono_procesa_bloques_y_lineas(sd, tmp_path):
+    (tmp_path / "d.csv").write_text("".join(f"{i},{i * i}\n" for i in range(100)))
+    sda = sd_manager.SDAsincrono(sd)
+    total = []
+    correr(sda.procesar_bloques("d.csv", lambda b: total.append(len(b)), tam=64))
+    assert sum(total) == os.path.getsize(tmp_path / "d.csv")
+    lineas = []
+    correr(sda.procesar_lineas("d.csv", lineas.append, cada=7))
+    assert len(lineas) == 100 and lineas[-1] == "99,9801\n"
+
+
+def test_asincrono_cede_entre_bloques(sd):
+    """Otra tarea corre mientras se copia: una vuelta por bloque."""
+    sd.escribir_archivo("grande.bin", "x" * 64 * 512)
+    sda = sd_manager.SDAsincrono(sd)
+    vueltas = [0]
+
+    async def vecina(fin):
+        while not fin.is_set():
+            vueltas[0] += 1
+            await asyncio.sleep(0)
+
+    async def principal():
+        fin = asyncio.Event()
+        tarea = asyncio.create_task(vecina(fin))
+        ok = await sda.copiar("grande.bin", "copia.bin", tam_bloque=512)
+        fin.set()
+        await tarea
+        return ok
+
+    assert correr(principal())
+    assert vueltas[0] >= 64
+
+
+def test_asincrono_vaciar_cada(sd, tmp_path):
+    sda = sd_manager.SDAsincrono(sd)
+
+    async def principal():
+        reg = sd.logger("v.log", intervalo_s=None)
+        tarea = asyncio.create_task(sda.vaciar_cada(reg, 0.01))
+        reg.linea(1, 2)
+        await asyncio.sleep(0.05)
+        en_disco = (tmp_path / "v.log").read_text()
+        reg.close()
+        await tarea
+        return en_disco
+
+    assert correr(principal()) == "1,2\n"
+
+
+def test_asincrono_montar_sin_tarjeta(tmp_path):
+    sdcardio.FALLA = 19
+    sd = sd_manager.SDManager(mount_point=str(tmp_path), informe=sd_manager.SILENCIO, perezoso=True)
+    assert not correr(sd_manager.SDAsincrono(sd).montar())
+    assert sd.estado[0] != sd_manager.OK
+
+
+# ---------------------- code.py ----------------------
+
+@pytest.fixture
+def codigo(tmp_path, monkeypatch):
+    """
+    Corre code.py con la SD en tmp_path. asyncio.run se corta a los 0.3 s
+    (la tarea de pantalla no termina nunca). Devuelve (namespace, cuántas
+    SDCard se habían creado en cada refresh de la pantalla).
+    """
+    class SDPrueba(sd_manager.SDManager):
+        def __init__(self, mount_point=None, **kwargs):
+            super().__init__(mount_point or str(tmp_path), **kwargs)
+
+    monkeypatch.setattr(sd_manager, "SDManager", SDPrueba)
+    inicios_por_refresh = []
+    refresh = board.DISPLAY.refresh
+
+    def contar(**kwargs):
+        inicios_por_refresh.append(len(sdcardio.INICIOS))
+        refresh(**kwargs)
+
+    monkeypatch.setattr(board.DISPLAY, "refresh", contar)
+    correr_real = asyncio.run
+
+    def limitado(coro):
+        async def con_tope():
+            try:
+                await asyncio.wait_for(coro, 0.3)
+            except asyncio.TimeoutError:
+                pass
+        return correr_real(con_tope())
+
+    monkeypatch.setattr(asyncio, "run", limitado)
+
+    def ejecutar():
+        return runpy.run_path(CODE_PY), inicios_por_refresh
+    return ejecutar
+
+
+def test_code_py_dibuja_antes_de_montar_la_sd(codigo, tmp_path):
+    ns, inicios_por_refresh = codigo()
+    assert inicios_por_refresh[0] == 0  # primer cuadro sin tocar la SD
+    assert len(sdcardio.INICIOS) == 1
+    assert (tmp_path / "archivo 1.txt").exists()
+    assert len(ns["sd_manager"].listar("/")) == 2  # el archivo y .contador
+    textos = [linea[1] for linea in ns["pantalla"].lineas]
+    assert textos[0].startswith("Capacidad:")
+    assert textos[3] == "Archivos:"
+
+
+def test_code_py_no_escribe_en_consola_al_redibujar(codigo, capsys):
+    ns, _ = codigo()
+    capsys.readouterr()
+    for _ in range(3):
+        ns["mostrar_sd_info"](esperar_sd=False)
+    assert capsys.readouterr().out == ""
+
+
+def test_code_py_sin_tarjeta(codigo):
+    sdcardio.FALLA = 19
+    ns, _ = codigo()
+    assert ns["pantalla"].lineas[0][1] == "SD no montada."
+
+
+# ---------------------- Latencia con un SPI lento ----------------------
+
+class ArchivoLento:
+    """Archivo real que tarda 1 µs por byte (SPI de ~1 MB/s)."""
+
+    def __init__(self, f):
+        self._f = f
+
+    def write(self, datos):
+        time.sleep(len(datos) / 1e6)
+        return self._f.write(datos)
+
+    def readinto(self, buf):
+        n = self._f.readinto(buf)
+        time.sleep((n or 0) / 1e6)
+        return n
+
+    def __getattr__(self, nombre):
+        return getattr(self._f, nombre)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+        return False
+
+
+def atraso_de_sensor(sd, monkeypatch, copia):
+    """Peor atraso (s) de una tarea que quiere correr cada 5 ms durante copia()."""
+    monkeypatch.setattr(sd_manager, "open", lambda *a, **k: ArchivoLento(open(*a, **k)), raising=False)
+    atrasos = []
+
+    async def sensor(fin):
+        while not fin.is_set():
+            t = time.monotonic()
+            await asyncio.sleep(0.005)
+            atrasos.append(time.monotonic() - t - 0.005)
+
+    async def principal():
+        fin = asyncio.Event()
+        tarea = asyncio.create_task(sensor(fin))
+        await asyncio.sleep(0)
+        await copia()
+        fin.set()
+        await tarea
+
+    correr(principal())
+    return max(atrasos)
+
+
+def test_sensor_no_espera_a_la_copia(sd, monkeypatch):
+    sd.escribir_archivo("grande.bin", "x" * 256 * 1024)
+    sda = sd_manager.SDAsincrono(sd)
+
+    async def por_partes():
+        await sda.copiar("grande.bin", "a.bin", tam_bloque=4096)
+
+    async def bloqueante():
+        sd.copiar_archivo("grande.bin", "b.bin", tam_bloque=4096)
+
+    # un bloque de 4 KB tarda ~8 ms (leer + escribir): ese es el atraso máximo
+    assert atraso_de_sensor(sd, monkeypatch, por_partes) < 0.1
+    assert atraso_de_sensor(sd, monkeypatch, bloqueante) > 0.4
+
+
+# ---------------------- Montaje perezoso y reintentos ----------------------
+
+def perezoso(tmp_path, **kwargs):
+    return sd_manager.SDManager(mount_point=str(tmp_path), informe=sd_manager.SILENCIO, perezoso=True, **kwargs)
+
+
+def test_perezoso_no_toca_la_tarjeta_hasta_usarla(tmp_path):
+    sd = perezoso(tmp_path)
+    assert sdcardio.INICIOS == []
+    assert sd.crear_archivo("a.txt", "hola")
+    assert len(sdcardio.INICIOS) == 1
+
+
+def test_sin_tarjeta_un_solo_intento_por_llamada(tmp_path):
+    sdcardio.FALLA = 19  # ENODEV
+    sd = perezoso(tmp_path)
+    assert not sd.crear_archivo("a.txt", "hola")
+    assert len(sdcardio.INICIOS) == 1
+    assert sd.estado[0] == sd_manager.NO_MONTADA
+    for _ in range(50):
+        sd.anexar_archivo("a.txt", "x")
+    assert len(sdcardio.INICIOS) == 1  # dentro de reintento_s no se reintenta
+
+
+def test_sin_tarjeta_reintenta_pasado_el_plazo(tmp_path):
+    sdcardio.FALLA = 19
+    sd = perezoso(tmp_path, reintento_s=0.0)
+    assert not sd.disponible()
+    sdcardio.FALLA = None
+    assert sd.crear_archivo("a.txt", "hola")
+    assert len(sdcardio.INICIOS) == 2
+
+
+def test_error_io_remonta_y_repite_una_vez(sd, tmp_path, monkeypatch):
+    fallas = [1]
+
+    def abrir(*args, **kwargs):
+        if fallas[0]:
+            fallas[0] -= 1
+            raise OSError(5, "EIO")
+        return open(*args, **kwargs)
+
+    monkeypatch.setattr(sd_manager, "open", abrir, raising=False)
+    antes = len(sdcardio.INICIOS)
+    assert sd.anexar_archivo("log.txt", "una vez\n")
+    assert (tmp_path / "log.txt").read_text() == "una vez\n"
+    assert len(sdcardio.INICIOS) == antes + 1
+
+
+def test_salud_desmonta_si_no_se_puede_leer(sd):
+    assert sd.salud()
+    sdcardio.FALLA = 5
+    assert not sd.salud()
+    assert not sd.mounted
+
+
+# ---------------------- Índice de líneas ----------------------
+
+def test_indice_vivo_coincide_con_el_archivo(sd, tmp_path):
+    """Con un Registro abierto, lo que dice el índice se puede leer ya."""
+    reg = sd.logger("v.log", tam_buffer=64, intervalo_s=None, indice=4)
+    for i in range(40):
+        reg.linea(i, "abc")
+    total = sd.indice("v.log", 4).total
+    assert total == len((tmp_path / "v.log").read_text().splitlines())
+    assert sd.leer_linea("v.log", total, cada=4) == f"{total - 1},abc\n"
+    assert sd.tail("v.log", 2, cada=4) == [f"{total - 2},abc\n", f"{total - 1},abc\n"]
+    reg.close()
+    assert sd.indice("v.log", 4).total == 40
+    assert sd.leer_linea("v.log", 40, cada=4) == "39,abc\n"
+
+
+# ---------------------- Cortes de luz ----------------------
+
+VIEJO = "VIEJO\n" * 50
+NUEVO = "NUEVO\n" * 50
+
+# (escritura, cómo queda cfg.txt si termina)
+ESCRITURAS = {
+    "atomico": (lambda sd: sd.escribir_archivo("cfg.txt", NUEVO, atomico=True), NUEVO),
+    "mover": (lambda sd: sd.mover_archivo("src.txt", "cfg.txt", sobrescribir=True), NUEVO),
+    # otro largo: no se puede pisar en el lugar, va por un temporal
+    "reemplazar": (lambda sd: sd.reemplazar_texto("cfg.txt", "VIEJO", "NUEVITO"), "NUEVITO\n" * 50),
+}
+
+
+@pytest.mark.parametrize("escritura", list(ESCRITURAS))
+def test_corte_deja_la_version_vieja_o_la_nueva(tmp_path, fat, escritura):
+    """Corta la luz antes de cada rename/remove; al volver a montar no quedan restos."""
+    escribir, nuevo = ESCRITURAS[escritura]
+    sistema = fat()
+    corte = 0
+    while True:
+        for p in tmp_path.iterdir():
+            p.unlink()
+        (tmp_path / "cfg.txt").write_text(VIEJO)
+        (tmp_path / "src.txt").write_text(NUEVO)
+        sd = sd_manager.SDManager(mount_point=str(tmp_path), informe=sd_manager.SILENCIO)
+        sistema.cambios = 0
+        sistema.corte_en = corte
+        try:
+            escribir(sd)
+            cortado = False
+        except sistema.Corte:
+            cortado = True
+        sistema.corte_en = None
+        sd_manager.SDManager(mount_point=str(tmp_path), informe=sd_manager.SILENCIO)
+        assert (tmp_path / "cfg.txt").read_text() in (VIEJO, nuevo), corte
+        assert [p.name for p in tmp_path.iterdir() if p.name.endswith("~")] == [], corte
+        if not cortado:
+            break
+        corte += 1
+    assert corte > 0
+    assert (tmp_path / "cfg.txt").read_text() == nuevo
+
+
+def test_slot_corrupto_devuelve_la_version_anterior(sd, tmp_path):
+    for i in range(5):
+        assert sd.escribir_slot("estado", f"v{i}")
+    assert sd.leer_slot("estado") == "v4"
+    # la última escritura quedó a medias (el byte final nunca llegó)
+    ultimo = tmp_path / "estado.a"
+    ultimo.write_bytes(ultimo.read_bytes()[:-1])
+    sd = sd_manager.SDManager(mount_point=str(tmp_path), informe=sd_manager.SILENCIO)
+    assert sd.leer_slot("estado") == "v3"
+    assert sd.escribir_slot("estado", "v5")
+    sd = sd_manager.SDManager(mount_point=str(tmp_path), informe=sd_manager.SILENCIO)
+    assert sd.leer_slot("estado") == "v5"
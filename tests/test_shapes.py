@@ -0,0 +1,406 @@
+# Regresión de los rasterizadores de shapes.py contra referencias simples.
+# Correr con: python -m pytest (desde la raíz)
+
+import collections
+import math
+import random
+import types
+
+import pytest
+
+import displayio
+import shapes
+
+VECINOS4 = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def pixeles(tg):
+    """{(x, y): color} de los píxeles no transparentes de un TileGrid."""
+    bmp = tg.bitmap
+    pal = tg.pixel_shader
+    out = {}
+    for y in range(bmp.height):
+        for x in range(bmp.width):
+            v = bmp._d[y * bmp.width + x]
+            if v not in pal.transparentes:
+                out[(tg.x + x, tg.y + y)] = pal[v]
+    return out
+
+
+def conexo8(px):
+    px = set(px)
+    if not px:
+        return True
+    pila = [next(iter(px))]
+    visto = {pila[0]}
+    while pila:
+        x, y = pila.pop()
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                q = (x + dx, y + dy)
+                if q in px and q not in visto:
+                    visto.add(q)
+                    pila.append(q)
+    return len(visto) == len(px)
+
+
+def borde(px):
+    """Píxeles de px con algún vecino 4 afuera."""
+    return {p for p in px if any((p[0] + a, p[1] + b) not in px for a, b in VECINOS4)}
+
+
+def elipse_referencia(rx, ry):
+    """Rasterizador de referencia: centro de píxel dentro de la elipse de radios + 0.5."""
+    return {
+        (x + rx, y + ry)
+        for x in range(-rx, rx + 1)
+        for y in range(-ry, ry + 1)
+        if (x / (rx + 0.5)) ** 2 + (y / (ry + 0.5)) ** 2 <= 1
+    }
+
+
+def distancia_a_elipse(x, y, a, b):
+    """Distancia aproximada (de primer orden) del punto a la elipse de semiejes a, b."""
+    f = (x / a) ** 2 + (y / b) ** 2 - 1
+    g = math.hypot(2 * x / (a * a), 2 * y / (b * b))
+    return abs(f) / g if g else 0.0
+
+
+@pytest.fixture(params=["bitmaptools", "python"])
+def modo(request, monkeypatch):
+    """Cada test corre con bitmaptools.fill_region y con el relleno fila a fila."""
+    if request.param == "bitmaptools":
+        monkeypatch.setattr(shapes, "bitmaptools", types.SimpleNamespace(fill_region=displayio.fill_region))
+    else:
+        monkeypatch.setattr(shapes, "bitmaptools", None)
+    return request.param
+
+
+@pytest.mark.parametrize("rx", range(30))
+def test_elipse_contra_referencia(modo, rx):
+    for ry in range(30):
+        relleno = set(pixeles(shapes.ellipse(rx, ry, rx, ry, fill=1)))
+        contorno = set(pixeles(shapes.ellipse(rx, ry, rx, ry, outline=2)))
+        ambos = pixeles(shapes.ellipse(rx, ry, rx, ry, fill=1, outline=2))
+        ref = elipse_referencia(rx, ry)
+
+        # la silueta difiere de la referencia solo en píxeles cuyo centro
+        # está a menos de medio píxel de la elipse (empates de redondeo)
+        for x, y in relleno ^ ref:
+            assert distancia_a_elipse(x - rx, y - ry, rx + 0.5, ry + 0.5) < 0.5, (rx, ry, x, y)
+
+        # contorno: conexo, dentro de la silueta y cubriendo todo su borde
+        assert conexo8(contorno), (rx, ry)
+        assert contorno <= relleno, (rx, ry)
+        assert borde(relleno) <= contorno, (rx, ry)
+
+        # relleno + contorno ocupa la silueta, con el borde del color del contorno
+        assert set(ambos) == relleno, (rx, ry)
+        assert {p for p, c in ambos.items() if c == 2} == contorno, (rx, ry)
+
+        # simétrica en los dos ejes
+        assert relleno == {(2 * rx - x, y) for x, y in relleno}, (rx, ry)
+        assert relleno == {(x, 2 * ry - y) for x, y in relleno}, (rx, ry)
+
+
+@pytest.mark.parametrize("stroke", [2, 3, 5])
+@pytest.mark.parametrize("rx,ry", [(10, 5), (20, 20), (7, 15)])
+def test_elipse_borde_grueso_conexo(modo, rx, ry, stroke):
+    contorno = set(pixeles(shapes.ellipse(rx, ry, rx, ry, outline=2, stroke=stroke)))
+    relleno = set(pixeles(shapes.ellipse(rx, ry, rx, ry, fill=1)))
+    assert conexo8(contorno)
+    assert borde(relleno) <= contorno <= relleno
+
+
+def circulo_referencia(r):
+    """
+    El círculo de antes: anillo midpoint de 1 píxel (8 octantes) y relleno
+    entre los extremos del anillo en cada fila. {(x, y): color}, fill=1 y
+    outline=2.
+    """
+    anillo = set()
+    x, y, err = r, 0, 1 - r
+    while x >= y:
+        for px, py in ((x, y), (y, x)):
+            for sx in (1, -1):
+                for sy in (1, -1):
+                    anillo.add((r + sx * px, r + sy * py))
+        y += 1
+        if err < 0:
+            err += 2 * y + 1
+        else:
+            x -= 1
+            err += 2 * (y - x + 1)
+    out = {p: 2 for p in anillo}
+    for fila in range(2 * r + 1):
+        xs = [p[0] for p in anillo if p[1] == fila]
+        for xx in range(min(xs), max(xs) + 1):
+            out.setdefault((xx, fila), 1)
+    return out
+
+
+@pytest.mark.parametrize("r", range(40))
+def test_circulo_igual_al_de_antes(modo, r):
+    ambos = pixeles(shapes.circle(r, r, r, fill=1, outline=2))
+    assert ambos == circulo_referencia(r)
+    # solo relleno y solo borde: misma silueta que con los dos
+    assert set(pixeles(shapes.circle(r, r, r, fill=1))) == set(ambos)
+    assert set(pixeles(shapes.circle(r, r, r, outline=2))) == {p for p, c in ambos.items() if c == 2}
+
+
+@pytest.mark.parametrize("stroke", [2, 3, 6])
+@pytest.mark.parametrize("r", [0, 1, 2, 5, 9, 17, 30, 39])
+def test_circulo_borde_grueso(modo, r, stroke):
+    contorno = set(pixeles(shapes.circle(r, r, r, outline=2, stroke=stroke)))
+    relleno = set(pixeles(shapes.circle(r, r, r, fill=1)))
+    assert conexo8(contorno)
+    assert borde(relleno) <= contorno <= relleno
+
+
+def bresenham(x0, y0, x1, y1):
+    """La línea de antes (Bresenham entero, extremos incluidos)."""
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+    out = set()
+    while True:
+        out.add((x0, y0))
+        if x0 == x1 and y0 == y1:
+            return out
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+
+def test_triangulo_contorno_igual_al_de_antes(modo):
+    rnd = random.Random(6)
+    for _ in range(300):
+        v = [rnd.randint(-20, 40) for _ in range(6)]
+        x0, y0, x1, y1, x2, y2 = v
+        ref = bresenham(x0, y0, x1, y1) | bresenham(x1, y1, x2, y2) | bresenham(x2, y2, x0, y0)
+        assert set(pixeles(shapes.triangle(*v, outline=2))) == ref, v
+        ambos = pixeles(shapes.triangle(*v, fill=1, outline=2))
+        assert {p for p, c in ambos.items() if c == 2} == ref, v
+        # el relleno va entre los bordes de cada fila, sin huecos
+        for y in {y for _, y in ambos}:
+            xs = sorted(x for x, yy in ambos if yy == y)
+            assert xs == list(range(xs[0], xs[-1] + 1)), (v, y)
+
+
+@pytest.mark.parametrize("semilla", range(40))
+def test_triangulos_de_una_malla_no_dejan_huecos_ni_se_pisan(modo, semilla):
+    """
+    Malla de 4x4 cuadriláteros de 10 px con los vértices interiores movidos
+    al azar, dos triángulos por cuadrilátero: con la regla top-left cubren
+    el cuadrado [0, 40) x [0, 40) pintando cada píxel una sola vez.
+    """
+    rnd = random.Random(semilla)
+    n, lado = 4, 10
+    pts = {}
+    for i in range(n + 1):
+        for j in range(n + 1):
+            x, y = i * lado, j * lado
+            if 0 < i < n:
+                x += rnd.randint(-3, 3)
+            if 0 < j < n:
+                y += rnd.randint(-3, 3)
+            pts[i, j] = (x, y)
+    veces = collections.Counter()
+    for i in range(n):
+        for j in range(n):
+            a, b, c, d = pts[i, j], pts[i + 1, j], pts[i + 1, j + 1], pts[i, j + 1]
+            diagonal = rnd.random() < 0.5
+            for tri in ((a, b, c), (a, c, d)) if diagonal else ((a, b, d), (b, c, d)):
+                veces.update(pixeles(shapes.triangle(*tri[0], *tri[1], *tri[2], fill=1)))
+    assert set(veces) == {(x, y) for x in range(n * lado) for y in range(n * lado)}
+    assert max(veces.values()) == 1
+
+
+# ---------------------- Canvas ----------------------
+
+ROJO, VERDE = 0xFF0000, 0x00FF00
+
+
+def figura_al_azar(rnd, nombre):
+    """
+    (args, kwargs_colores, kwargs_canvas) para shapes.<nombre> y
+    Canvas.<nombre>, con posiciones que a veces caen en parte fuera del
+    lienzo de 60x40.
+    """
+    p = lambda: rnd.randint(-25, 85)  # noqa: E731
+    t = lambda: rnd.randint(1, 30)  # noqa: E731
+    if nombre in ("line", "polyline", "hline", "vline"):
+        if nombre == "line":
+            args = (p(), p(), p(), p())
+            extra = {"thickness": rnd.randint(1, 4)}
+        elif nombre == "polyline":
+            args = ([(p(), p()) for _ in range(rnd.randint(2, 5))],)
+            extra = {"thickness": rnd.randint(1, 3), "closed": rnd.random() < 0.5}
+        else:
+            args = (p(), p(), t())
+            extra = {}
+        return args + (VERDE,), extra, args + (2,), extra
+    relleno, borde_ = rnd.choice([(True, False), (False, True), (True, True)])
+    colores = {"fill": ROJO if relleno else None, "outline": VERDE if borde_ else None}
+    indices = {"fill": 1 if relleno else None, "outline": 2 if borde_ else None}
+    if nombre == "triangle":
+        args = tuple(p() for _ in range(6))
+        return args, colores, args, indices
+    colores["stroke"] = indices["stroke"] = rnd.randint(1, 4)
+    if nombre == "rect":
+        args = (p(), p(), t(), t())
+    elif nombre == "rounded_rect":
+        w, h = t(), t()
+        args = (p(), p(), w, h, rnd.randint(0, min(w, h) // 2))
+    elif nombre == "circle":
+        args = (p(), p(), rnd.randint(0, 20))
+    else:
+        args = (p(), p(), rnd.randint(0, 20), rnd.randint(0, 20))
+    return args, colores, args, indices
+
+
+@pytest.mark.parametrize("nombre", ["rect", "hline", "vline", "line", "polyline", "circle",
+                                    "ellipse", "triangle", "rounded_rect"])
+def test_canvas_igual_a_las_funciones_sueltas(modo, nombre):
+    rnd = random.Random(nombre)
+    pal = displayio.Palette(3)
+    pal[1] = ROJO
+    pal[2] = VERDE
+    pal.make_transparent(0)
+    for i in range(300):
+        args, colores, args_c, indices = figura_al_azar(rnd, nombre)
+        suelta = pixeles(getattr(shapes, nombre)(*args, **colores))
+        esperado = {(x, y): c for (x, y), c in suelta.items() if 0 <= x < 60 and 0 <= y < 40}
+
+        canvas = shapes.Canvas(60, 40, pal)
+        assert canvas.take_dirty() is None
+        getattr(canvas, nombre)(*args_c, **indices)
+        assert pixeles(canvas.tilegrid) == esperado, (i, args)
+
+        sucio = canvas.take_dirty()
+        if esperado:
+            x0, y0, x1, y1 = sucio
+            assert 0 <= x0 <= x1 < 60 and 0 <= y0 <= y1 < 40, (i, args)
+            assert all(x0 <= x <= x1 and y0 <= y <= y1 for x, y in esperado), (i, args)
+        assert canvas.take_dirty() is None
+
+
+# ---------------------- rect(solid=True) ----------------------
+
+def componer(nodo, ox=0, oy=0, escala=1, out=None):
+    """
+    {(x, y): color} de lo que displayio mostraría de un Group/TileGrid: la
+    posición de cada hijo va en la escala del padre y la escala se acumula;
+    lo que se dibuja después tapa a lo anterior.
+    """
+    if out is None:
+        out = {}
+    ox += nodo.x * escala
+    oy += nodo.y * escala
+    if isinstance(nodo, displayio.Group):
+        for hijo in nodo:
+            componer(hijo, ox, oy, escala * nodo.scale, out)
+        return out
+    bmp = nodo.bitmap
+    tw, th = nodo.tile_width, nodo.tile_height
+    por_fila = bmp.width // tw
+    for ty in range(nodo.height):
+        for tx in range(nodo.width):
+            tile = nodo[tx, ty]
+            sx = (tile % por_fila) * tw
+            sy = (tile // por_fila) * th
+            for v in range(th):
+                for u in range(tw):
+                    valor = bmp._d[(sy + v) * bmp.width + sx + u]
+                    if valor in nodo.pixel_shader.transparentes:
+                        continue
+                    x = ox + (tx * tw + u) * escala
+                    y = oy + (ty * th + v) * escala
+                    for dy in range(escala):
+                        for dx in range(escala):
+                            out[(x + dx, y + dy)] = nodo.pixel_shader[valor]
+    return out
+
+
+@pytest.mark.parametrize("colores", [{"fill": ROJO}, {"outline": VERDE}, {"fill": ROJO, "outline": VERDE}],
+                         ids=["fill", "outline", "fill+outline"])
+@pytest.mark.parametrize("stroke", [1, 2, 3, 5])
+def test_rect_solido_igual_al_bitmap(modo, colores, stroke):
+    for w in range(1, 13):
+        for h in range(1, 13):
+            solido = shapes.rect(3, 2, w, h, stroke=stroke, solid=True, **colores)
+            assert isinstance(solido, displayio.Group)
+            bitmap = shapes.rect(3, 2, w, h, stroke=stroke, **colores)
+            assert componer(solido) == pixeles(bitmap), (w, h)
+
+
+# ---------------------- BitmapCache ----------------------
+
+@pytest.fixture
+def sprites(monkeypatch):
+    """Un BitmapCache nuevo en lugar de shapes.sprites (el global se comparte)."""
+    def instalar(max_bytes=16384):
+        cache = shapes.BitmapCache(max_bytes)
+        monkeypatch.setattr(shapes, "sprites", cache)
+        return cache
+    return instalar
+
+
+def test_cache_comparte_el_bitmap_entre_colores(modo, sprites):
+    cache = sprites()
+    rojo = shapes.circle(10, 10, 6, fill=ROJO, outline=VERDE, cache=True)
+    azul = shapes.circle(40, 10, 6, fill=0x0000FF, outline=VERDE, cache=True)
+    assert azul.bitmap is rojo.bitmap
+    assert azul.pixel_shader is not rojo.pixel_shader
+    assert pixeles(rojo) == pixeles(shapes.circle(10, 10, 6, fill=ROJO, outline=VERDE))
+    assert pixeles(azul) == pixeles(shapes.circle(40, 10, 6, fill=0x0000FF, outline=VERDE))
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # sin borde, el stroke no cambia el bitmap; otra geometría, sí
+    solo = shapes.circle(0, 0, 6, fill=ROJO, stroke=1, cache=True)
+    assert shapes.circle(0, 0, 6, fill=VERDE, stroke=3, cache=True).bitmap is solo.bitmap
+    assert shapes.circle(0, 0, 6, fill=ROJO, outline=VERDE, stroke=2, cache=True).bitmap is not rojo.bitmap
+    assert shapes.circle(0, 0, 7, fill=ROJO, outline=VERDE, cache=True).bitmap is not rojo.bitmap
+    assert shapes.circle(0, 0, 6, fill=ROJO, outline=VERDE).bitmap is not rojo.bitmap  # sin cache=True
+    s = cache.stats()
+    assert (s["hits"], s["misses"], s["entries"], s["evictions"]) == (2, 4, 4, 0)
+
+
+def test_cache_descarta_lo_menos_usado(modo, sprites):
+    cache = sprites()
+    shapes.circle(0, 0, 5, fill=ROJO, cache=True)
+    cache.max_bytes = 2 * cache.bytes  # entran justo dos círculos de r=5
+    a = shapes.circle(0, 0, 5, fill=ROJO, cache=True).bitmap
+    b = shapes.circle(0, 0, 5, outline=ROJO, cache=True).bitmap
+    assert shapes.circle(0, 0, 5, fill=VERDE, cache=True).bitmap is a  # a pasa a ser el más usado
+    shapes.circle(0, 0, 5, fill=ROJO, outline=VERDE, cache=True)  # descarta b
+    assert cache.stats()["evictions"] == 1
+    assert shapes.circle(0, 0, 5, fill=ROJO, cache=True).bitmap is a
+    assert shapes.circle(0, 0, 5, outline=ROJO, cache=True).bitmap is not b
+    assert cache.bytes <= cache.max_bytes
+
+
+def test_cache_respeta_el_presupuesto(modo, sprites):
+    cache = sprites(max_bytes=600)
+    rnd = random.Random(10)
+    for i in range(500):
+        r = rnd.randint(0, 15)
+        colores = rnd.choice([{"fill": ROJO}, {"outline": VERDE}, {"fill": ROJO, "outline": VERDE}])
+        if rnd.random() < 0.5:
+            tg = shapes.circle(20, 20, r, cache=True, **colores)
+            esperado = pixeles(shapes.circle(20, 20, r, **colores))
+        else:
+            tg = shapes.rect(5, 5, r + 1, 2 * r + 1, cache=True, **colores)
+            esperado = pixeles(shapes.rect(5, 5, r + 1, 2 * r + 1, **colores))
+        assert pixeles(tg) == esperado, i
+        s = cache.stats()
+        assert s["bytes"] <= s["max_bytes"], i
+        assert s["hits"] + s["misses"] == i + 1
+        assert s["entries"] == s["misses"] - s["evictions"]
+    assert s["hits"] > 0 and s["evictions"] > 0